@@ -1,25 +1,96 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from schemas.document import DatasetDocument, Paragraph
-from schemas.graph import Graph
+from schemas.graph import EdgePage, Graph, Neighborhood, NodePage
+from schemas.job import Job
 from utils.pdf_reader import PDFReader
-from utils.relations import generate_graph_data
 from utils.document_store import DocumentStore
-from schemas.contradiction import Contradiction
-from utils.contradictions import classify_contradiction, postfilter_and_rank
+from utils.config import Config
+from utils.models import ModelRegistry
+from utils.parse_cache import ParseCache
+from utils.embedding_cache import EmbeddingCache
+from utils.verdict_cache import VerdictCache
+from utils.prescreen import ContradictionPrescreen
+from utils.document_model import DocumentModel
+from utils.graph_index import MAX_HOPS, GraphIndex, GraphIndexCache, InvalidCursor
+from utils.graph_codec import JSON, compress, content_encoding, dumps, encode, loads, negotiate
+from utils.pipeline import DocumentPipeline, graph_fingerprint, pipeline_fingerprint
+from utils.result_store import ResultStore, etag_for
+from utils.upload_form import FORM_OVERHEAD_BYTES, FormError, read_upload_form
+from utils.upload_store import UploadTooLarge
+from utils.utils import file_sha256
+from utils.jobs import JobManager, QueueFull
+from utils.contradictions import ContradictionClassifier
+import gzip
 import logging
-import shutil
-import tempfile
-import os
-import uuid
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-pdf_reader = PDFReader()
+pdf_reader = PDFReader(WORKERS=Config.PDF_WORKERS, MATCH_THREADS=Config.PDF_MATCH_THREADS)
 
 document_store = DocumentStore()
 
+model_registry = ModelRegistry()
+
+parse_cache = ParseCache(
+    Config.PARSE_CACHE_DIR,
+    max_bytes=Config.PARSE_CACHE_MAX_BYTES,
+    pipeline_version=Config.PIPELINE_VERSION,
+)
+
+verdict_cache = VerdictCache(
+    Config.VERDICT_CACHE_PATH,
+    ttl_seconds=Config.VERDICT_CACHE_TTL_SECONDS,
+    max_entries=Config.VERDICT_CACHE_MAX_ENTRIES,
+)
+
+contradiction_classifier = ContradictionClassifier(verdict_cache=verdict_cache)
+
+prescreen = ContradictionPrescreen(
+    model_registry,
+    threshold=Config.PRESCREEN_THRESHOLD,
+    top_n=Config.PRESCREEN_TOP_N,
+    llm_budget=Config.LLM_CALL_BUDGET,
+    batch_size=Config.PRESCREEN_BATCH_SIZE,
+)
+
+embedding_cache = EmbeddingCache(
+    Config.EMBEDDING_CACHE_DIR,
+    model_name=Config.EMBEDDING_MODEL,
+    memory_items=Config.EMBEDDING_CACHE_MEMORY_ITEMS,
+)
+
+# Graphs alone, reused by /process runs that only differ past the graph
+document_store.set_graph_store(ResultStore(Config.GRAPH_STORE_DIR, fingerprint=graph_fingerprint(pdf_reader)))
+
+result_store = ResultStore(
+    Config.RESULT_STORE_DIR,
+    fingerprint=pipeline_fingerprint(pdf_reader, contradiction_classifier),
+)
+
+pipeline = DocumentPipeline(
+    pdf_reader,
+    parse_cache,
+    document_store,
+    model_registry,
+    embedding_cache,
+    contradiction_classifier,
+    prescreen,
+    result_store,
+    threads=Config.JOB_CONCURRENCY,
+)
+
+graph_indexes = GraphIndexCache(max_items=Config.GRAPH_INDEX_CACHE_ITEMS)
+
+jobs = JobManager(
+    pipeline,
+    concurrency=Config.JOB_CONCURRENCY,
+    queue_size=Config.JOB_QUEUE_SIZE,
+    ttl_seconds=Config.JOB_TTL_SECONDS,
+)
+
 @router.get("/list_documents", response_model=list[DatasetDocument])
 def list_documents():
     if not document_store._initialized:
@@ -43,147 +114,347 @@ def get_document_pdf(document_id: str):
     raise HTTPException(status_code=404, detail="Document not found")
 
 
-@router.post("/process", response_model=Graph)
-async def process_document(
-    document_id: str = Form(...),
-    file: UploadFile = File(None)
-):
-    tmp_path = None
+def _form_schema(required: list[str], **properties) -> dict:
+    # The forms are read from the stream by hand, so they are described here
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": required, "properties": properties,
+    }}}}}
 
-    try:
-        if file:
-            if not file.filename.lower().endswith(".pdf"):
-                raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                shutil.copyfileobj(file.file, tmp)
-                tmp_path = tmp.name
-
-        else:
-            pdf_path = document_store.get_path(document_id)
-
-            if not pdf_path:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Documento no encontrado localmente"
-                )
-
-            tmp_path = str(pdf_path)
-
-        df_paragraphs, df_lines = pdf_reader.PDF_to_dataframe(tmp_path)
-
-        paragraphs = [
-            Paragraph(
-                id=f"{index}",
-                documentId=document_id,
-                page=int(row["page"]),
-                paragraph_enum=int(row["paragraph_enum"]),
-                text=row.get("clean_text", row["text"]),
-                bbox=[
-                    float(row["x0"]),
-                    float(row["y0"]),
-                    float(row["x1"]),
-                    float(row["y1"]),
-                ],
-            )
-            for index, row in df_paragraphs.iterrows()
-        ]
-
-        graph_data = generate_graph_data(paragraphs)
-
-        id2text = {n["id"]: n["text"] for n in graph_data["nodes"]}
-        
-        raw_candidates = []
-        for e in graph_data["edges"]:
-            et = e.get("type", "")
-            if not (et.startswith("reference") or et == "semantic_similarity"):
-                continue
-
-            a = id2text.get(e["source"], "")
-            b = id2text.get(e["target"], "")
-            if not a or not b:
-                continue
-
-            result = classify_contradiction(a, b, model="gpt-4o-mini")
-            raw_candidates.append({
-                "source": e["source"],
-                "target": e["target"],
-                "edge_type": et,
-                "edge_score": e.get("score"),
-                "result": result
-            })
-
-        ranked = postfilter_and_rank(raw_candidates)
-
-        final_contradictions = []
-        for c in ranked:
-            source_node = next(n for n in paragraphs if n.id == c["source"])
-            target_node = next(n for n in paragraphs if n.id == c["target"])
-            
-            ev_a = c["result"].get("evidence", {}).get("source", "")
-            ev_b = c["result"].get("evidence", {}).get("target", "")
-
-            bbox_a = pdf_reader.get_text_bbox(ev_a, df_lines, source_node.page)
-            bbox_b = pdf_reader.get_text_bbox(ev_b, df_lines, target_node.page)
-
-            final_contradictions.append(
-                Contradiction(
-                    source=c["source"],
-                    target=c["target"],
-                    type=c["result"].get("type", "other"),
-                    confidence=float(c["result"].get("confidence", 0.0)),
-                    edge_type=c["edge_type"],
-                    edge_score=c.get("edge_score"),
-                    evidence_a=ev_a,
-                    evidence_b=ev_b,
-                    evidence_a_bbox=bbox_a,
-                    evidence_b_bbox=bbox_b,
-                    evidence_a_page=source_node.page,
-                    evidence_b_page=target_node.page,
-                    summary=c["result"].get("summary", ""),
-                    score=float(c.get("final_score", 0.0)),
-                )
-            )
 
-        graph_data["contradictions"] = [c.model_dump() for c in final_contradictions]
-        return Graph(**graph_data)  
+PDF_FIELD = {"type": "string", "format": "binary"}
+PROCESS_FORM = _form_schema(
+    [], document_id={"type": "string"}, file=PDF_FIELD,
+    background={"type": "boolean", "default": False}, force={"type": "boolean", "default": False},
+)
 
-    finally:
-        if file and tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
 
+def _form_flag(fields: dict[str, str], name: str) -> bool:
+    value = fields.get(name, "").strip().lower()
+    if value in ("", "0", "false", "off", "no"):
+        return False
+    if value in ("1", "true", "on", "yes"):
+        return True
+    raise HTTPException(status_code=422, detail=f"{name} must be a boolean")
 
-@router.post("/upload", response_model=list[Paragraph])
-async def upload_document(file: UploadFile = File(...)):
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        tmp_path = tmp.name
+async def _read_form(request: Request) -> tuple[dict[str, str], tuple[DatasetDocument, str] | None]:
+    """
+    Text fields of a form post and, when it carries a PDF, the document it
+    is registered as and its SHA-256. The upload is hashed and stored while
+    the body streams in; a Content-Length too large for any allowed upload
+    is refused before the body is read, and the read stops at the first
+    byte past UPLOAD_MAX_BYTES.
+    """
+    try:
+        length = request.headers.get("content-length", "")
+        if length.isdigit():
+            document_store.check_upload_length(int(length) - FORM_OVERHEAD_BYTES)
+        fields, upload = await read_upload_form(request, document_store.open_upload)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except FormError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if upload is None:
+        return fields, None
+    return fields, await run_in_threadpool(document_store.add_upload, upload)
+
 
+def _submit(pdf_path: str, document_id: str, pdf_sha256: str) -> dict:
     try:
-        df = pdf_reader.PDF_to_dataframe(tmp_path)
-        doc_id = "upload_" + uuid.uuid4().hex[:8]
-
-        paragraphs = [
-            Paragraph(
-                id=f"{doc_id}_{index}",
-                documentId=doc_id,
-                page=int(row["page"]),
-                paragraph_enum=int(row["paragraph_enum"]),
-                text=row.get("clean_text", row["text"]),
-                bbox=[
-                    float(row["x0"]),
-                    float(row["y0"]),
-                    float(row["x1"]),
-                    float(row["y1"]),
-                ],
+        return jobs.submit(pdf_path, document_id, pdf_sha256=pdf_sha256)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def _stored_result(request: Request) -> tuple[str, str, str, dict | None, dict[str, str]]:
+    """
+    Document id, PDF path and hash for a /process form, the stored result
+    built from that PDF unless force asks for a new one, and the form's
+    fields. An uploaded file is registered first and processed as its
+    upload document, a document_id naming any other document is a 400.
+    """
+    fields, upload = await _read_form(request)
+    document_id = fields.get("document_id", "")
+    force = _form_flag(fields, "force")
+
+    if upload is not None:
+        doc, pdf_sha256 = upload
+        if document_id and document_id != doc.id:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The uploaded file is document {doc.id}, not {document_id}; leave document_id empty or send {doc.id}"
+            )
+        document_id = doc.id
+        pdf_path = str(document_store.get_path(document_id))
+    else:
+        if not document_id:
+            raise HTTPException(status_code=422, detail="document_id or file is required")
+        pdf_path = document_store.get_path(document_id)
+
+        if not pdf_path:
+            raise HTTPException(
+                status_code=404,
+                detail="Documento no encontrado localmente"
             )
-            for index, row in df.iterrows()
-        ]
 
-        return paragraphs
+        pdf_path = str(pdf_path)
+        pdf_sha256 = await run_in_threadpool(file_sha256, pdf_path)
+
+    meta = None if force else await run_in_threadpool(result_store.get_meta, document_id, pdf_sha256)
+    return document_id, pdf_path, pdf_sha256, meta, fields
+
+
+def _encoded_response(request: Request, graph: dict, headers: dict | None = None) -> Response:
+    """
+    graph in the format and compression the client asks for, see
+    utils.graph_codec. The dicts are already in Graph's shape and are
+    serialized without being validated again.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    encoding = content_encoding(request.headers.get("accept-encoding"))
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=compress(encode(graph, media_type), encoding), media_type=media_type, headers=headers)
+
+
+def _graph_response(request: Request, document_id: str, meta: dict, conditional: bool = True) -> Response | None:
+    """
+    The stored graph, 304 when the client's ETag is current and the request
+    is conditional. Only GET and HEAD are, a 304 is no answer to a POST. The
+    gzipped JSON body is sent as is to clients that take it.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    # Every format of a result gets its own tag
+    etag = meta["etag"] if media_type == JSON else etag_for(f"{meta['etag']} {media_type}".encode("utf-8"))
+
+    if conditional:
+        if_none_match = request.headers.get("if-none-match", "")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    body = result_store.load_bytes(document_id)
+    if body is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    if media_type != JSON:
+        return _encoded_response(request, loads(gzip.decompress(body)), headers)
+
+    encoding = content_encoding(request.headers.get("accept-encoding"))
+    if encoding != "gzip":
+        body = compress(gzip.decompress(body), encoding)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=JSON, headers=headers)
+
+
+@router.post("/process", response_model=Graph | Job, openapi_extra=PROCESS_FORM)
+async def process_document(request: Request, response: Response):
+    """
+    Processes the document on the job pool. With background the job is
+    returned right away, 202, to be polled at /jobs/{id}; otherwise the
+    request waits for the graph. A result stored for the same PDF and
+    pipeline is returned directly, unless force is set.
+
+    Form fields: document_id, file, background and force. An uploaded file
+    is processed as the upload document it is registered as, upload_ and
+    the start of its SHA-256; document_id may then be left out, and naming
+    another document is rejected with 400. The graph comes
+    as JSON or, by Accept, in a compact columnar format, see
+    utils.graph_codec.
+    """
+    document_id, pdf_path, pdf_sha256, meta, fields = await _stored_result(request)
+    # Encoding and compressing a whole graph is kept off the event loop. If-None-Match
+    # is ignored, the stored graph is always sent in full
+    if meta is not None and (stored := await run_in_threadpool(_graph_response, request, document_id, meta, False)) is not None:
+        return stored
+
+    job = _submit(pdf_path, document_id, pdf_sha256)
+
+    if _form_flag(fields, "background"):
+        response.status_code = 202
+        response.headers["Location"] = str(request.url_for("get_job", job_id=job["id"]))
+        return Job(**job)
+
+    job = await jobs.wait(job["id"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Error processing document: {job['error']}")
+    return await run_in_threadpool(_encoded_response, request, job["result"])
+
+
+@router.post("/process/stream", openapi_extra=PROCESS_FORM)
+async def process_document_stream(request: Request):
+    """
+    Same work as /process, streamed as NDJSON, one event per line, see
+    DocumentPipeline for the events. A stored result is replayed as the
+    same events.
+    """
+    document_id, pdf_path, pdf_sha256, meta, _ = await _stored_result(request)
+    graph = await run_in_threadpool(result_store.load, document_id) if meta is not None else None
+
+    if graph is not None:
+        headers = {}
+        events = _replay(graph)
+    else:
+        job = _submit(pdf_path, document_id, pdf_sha256)
+        headers = {"X-Job-Id": job["id"]}
+        events = jobs.events(job["id"])
+
+    async def lines():
+        async for event in events:
+            # The nodes and edges lines hold the whole graph
+            if event["event"] in ("nodes", "edges"):
+                yield await run_in_threadpool(dumps, event) + b"\n"
+            else:
+                yield dumps(event) + b"\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers},
+    )
+
+
+async def _replay(graph: dict):
+    yield {"event": "nodes", "nodes": graph["nodes"]}
+    yield {"event": "edges", "edges": graph["edges"], "relationsCount": [node["relationsCount"] for node in graph["nodes"]]}
+    for contradiction in graph["contradictions"]:
+        yield {"event": "contradiction", "contradiction": contradiction}
+    yield {"event": "summary", "contradictions": graph["contradictions"], "timings": {}, "stored": True}
+
+
+@router.get("/{document_id}/graph", response_model=Graph)
+def get_document_graph(document_id: str, request: Request):
+    """
+    The stored result of /process for the document, with an ETag for
+    conditional requests.
+    """
+    meta = result_store.get_meta(document_id)
+    response = _graph_response(request, document_id, meta) if meta is not None else None
+    if response is None:
+        raise HTTPException(status_code=404, detail="Graph not found, process the document first")
+    return response
+
+
+def _graph_index(document_id: str) -> GraphIndex:
+    """
+    Index of the document's stored result or, without one, of its graph as
+    built by scripts.preprocess_cuad or a run whose result was not stored.
+    """
+    index = None
+    if (meta := result_store.get_meta(document_id)) is not None:
+        index = graph_indexes.get(document_id, meta["etag"], lambda: result_store.load(document_id))
+    elif (meta := document_store.get_graph_meta(document_id)) is not None:
+        index = graph_indexes.get(document_id, meta["etag"], lambda: document_store.get_graph(document_id))
+    if index is None:
+        raise HTTPException(status_code=404, detail="Graph not found, process the document first")
+    return index
+
+
+def _page(index: GraphIndex, positions, cursor: str | None, limit: int):
+    try:
+        return index.page(positions, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{document_id}/nodes", response_model=NodePage)
+def get_document_nodes(
+    document_id: str,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+):
+    """
+    The nodes of the stored graph a page at a time, in graph order.
+    """
+    index = _graph_index(document_id)
+    rows, next_cursor = _page(index, index.node_rows, cursor, limit)
+    return {"items": [index.nodes[row] for row in rows], "total": len(index.nodes), "next_cursor": next_cursor}
+
+
+@router.get("/{document_id}/nodes/top", response_model=list[Paragraph])
+def get_top_nodes(document_id: str, n: int = Query(20, ge=1, le=1000)):
+    """
+    The n nodes with the most relations, graph order on ties.
+    """
+    return _graph_index(document_id).top(n)
+
+
+@router.get("/{document_id}/nodes/{node_id}/neighborhood", response_model=Neighborhood)
+def get_node_neighborhood(
+    document_id: str,
+    node_id: str,
+    k: int = Query(1, ge=1, le=MAX_HOPS),
+    type: list[str] | None = Query(None),
+    limit: int = Query(200, ge=1, le=1000),
+):
+    """
+    The nodes at most k hops from node_id, nearest first, and the edges
+    between them. Only edges of the given types are walked, when any are.
+    """
+    index = _graph_index(document_id)
+    if node_id not in index.rows:
+        raise HTTPException(status_code=404, detail="Node not found")
+
+    rows, hops, edges, truncated = index.neighborhood(node_id, k, type, limit)
+    nodes = [index.nodes[row] for row in rows]
+    return {
+        "center": node_id,
+        "k": k,
+        "nodes": nodes,
+        "edges": [index.edges[position] for position in edges],
+        "hops": {node["id"]: hop for node, hop in zip(nodes, hops.tolist())},
+        "truncated": truncated,
+    }
+
+
+@router.get("/{document_id}/edges", response_model=EdgePage)
+def get_document_edges(
+    document_id: str,
+    type: list[str] | None = Query(None),
+    min_score: float | None = None,
+    max_score: float | None = None,
+    ref_label: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+):
+    """
+    The edges of the stored graph matching every filter given, a page at a
+    time, in graph order. type may be repeated. Edges without a score, the
+    reference ones, never match a score bound.
+    """
+    index = _graph_index(document_id)
+    positions = index.edge_positions(type, min_score, max_score, ref_label)
+    selected, next_cursor = _page(index, positions, cursor, limit)
+    return {"items": [index.edges[p] for p in selected], "total": len(positions), "next_cursor": next_cursor}
+
+
+@router.get("/jobs/{job_id}", response_model=Job)
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**job)
+
+
+@router.post("/upload", response_model=list[Paragraph], openapi_extra=_form_schema(["file"], file=PDF_FIELD))
+async def upload_document(request: Request):
+    """
+    Stores the PDF in the file field of the form and returns its paragraphs.
+    """
+    _, upload = await _read_form(request)
+    if upload is None:
+        raise HTTPException(status_code=422, detail="file is required")
+    doc, pdf_sha256 = upload
+
+    try:
+        df, _ = await run_in_threadpool(
+            parse_cache.get_or_parse, document_store.get_path(doc.id), pdf_reader, pdf_sha256
+        )
+        return DocumentModel.from_dataframe(df, doc.id, id_prefix=f"{doc.id}_").to_nodes()
 
     except Exception as e:
         logger.error(f"Error processing uploaded document: {e}")
@@ -192,9 +463,21 @@ async def upload_document(file: UploadFile = File(...)):
             detail=f"Error processing document: {str(e)}"
         )
 
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+
+@router.get("/stats")
+def stats():
+    return {
+        "parse_cache": parse_cache.stats(),
+        "embedding_model": model_registry.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "verdict_cache": verdict_cache.stats(),
+        "prescreen": prescreen.stats(),
+        "llm": contradiction_classifier.stats(),
+        "jobs": jobs.stats(),
+        "result_store": result_store.stats(),
+        "uploads": document_store.upload_stats(),
+        "graph_indexes": graph_indexes.stats(),
+    }
 
 
 @router.get("/")
@@ -6,12 +6,22 @@ from contextlib import asynccontextmanager
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
 from api import documents
+from utils.config import Config
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize the document store on startup
     documents.document_store.initialize()
+    # Load the embedding model once instead of on every /process call
+    documents.model_registry.initialize()
+    # Offline only the rules run, the pre-screen has nothing to escalate to
+    if Config.PRESCREEN_ENABLED and not documents.contradiction_classifier.offline:
+        documents.model_registry.get_cross_encoder()
+    # Background workers that run /process jobs
+    documents.jobs.start()
     yield
+    await documents.jobs.stop()
+    documents.pdf_reader.close()
 
 app = FastAPI(lifespan=lifespan)
 
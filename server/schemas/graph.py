@@ -15,3 +15,24 @@ class Graph(BaseModel):
     nodes: List[Paragraph]
     edges: List[Edge]
     contradictions: List[Contradiction] = []
+
+class NodePage(BaseModel):
+    items: List[Paragraph]
+    total: int
+    # Pass back as cursor for the next page, None on the last one
+    next_cursor: str | None = None
+
+class EdgePage(BaseModel):
+    items: List[Edge]
+    total: int
+    next_cursor: str | None = None
+
+class Neighborhood(BaseModel):
+    center: str
+    k: int
+    nodes: List[Paragraph]
+    edges: List[Edge]
+    # Hops from the center of every node
+    hops: Dict[str, int]
+    # Set when the farthest nodes were left out to stay within limit
+    truncated: bool = False
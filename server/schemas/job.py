@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Literal, Dict
+from .graph import Graph
+
+class Job(BaseModel):
+    id: str
+    document_id: str
+    status: Literal['queued', 'running', 'done', 'failed']
+    stage: str
+    progress: Dict[str, int]
+    timings: Dict[str, float] = {}
+    created: float
+    started: float | None = None
+    finished: float | None = None
+    error: str | None = None
+    result: Graph | None = None
+    # Requests that attached to this job instead of starting their own
+    coalesced: int = 0
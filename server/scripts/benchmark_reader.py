@@ -0,0 +1,104 @@
+"""
+Per-page cost of the PDFReader stages, reference vs vectorized engine.
+
+Every vectorized stage is also checked against its reference output, so this
+doubles as the equivalence check for the reader rewrites.
+
+    cd server && python -m scripts.benchmark_reader --limit 20
+"""
+import argparse
+import time
+
+import fitz
+import pandas as pd
+
+from utils.config import Config
+from utils.pdf_reader import PDFReader
+from utils.utils import iter_pdfs
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def bench_read(reader, pdf_path):
+    ref, t_ref = _timed(reader.read_pdf, str(pdf_path))
+    new, t_new = _timed(reader.read_pdf_columnar, str(pdf_path))
+    pd.testing.assert_frame_equal(ref, new)
+    return t_ref, t_new
+
+
+def bench_lines(reader, pdf_path):
+    pdf_df = reader.read_pdf_columnar(str(pdf_path))
+    ref, t_ref = _timed(reader.set_lines, pdf_df)
+    new, t_new = _timed(reader.set_lines_vectorized, pdf_df)
+    pd.testing.assert_frame_equal(ref, new)
+    return t_ref, t_new
+
+
+def bench_paragraphs(reader, pdf_path):
+    df_lines = reader.filter_lines(reader.set_lines_vectorized(reader.read_pdf_columnar(str(pdf_path))))
+    ref, t_ref = _timed(reader.set_paragraphs_intelligent, df_lines)
+    new, t_new = _timed(reader.set_paragraphs_vectorized, df_lines)
+    pd.testing.assert_frame_equal(ref, new)
+    return t_ref, t_new
+
+
+def bench_filter_paragraphs(reader, pdf_path):
+    df_lines = reader.filter_lines(reader.set_lines_vectorized(reader.read_pdf_columnar(str(pdf_path))))
+    df_paragraphs = reader.set_paragraphs_vectorized(df_lines)
+    ref, t_ref = _timed(PDFReader(ENGINE="reference").filter_paragraphs, df_paragraphs)
+    new, t_new = _timed(reader.filter_paragraphs, df_paragraphs)
+    pd.testing.assert_frame_equal(ref, new)
+    return t_ref, t_new
+
+
+STAGES = {
+    "read_pdf": bench_read,
+    "set_lines": bench_lines,
+    "paragraphs": bench_paragraphs,
+    "filter_paragraphs": bench_filter_paragraphs,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: largest CUAD contracts)")
+    parser.add_argument("--limit", type=int, default=10, help="number of CUAD contracts when no PDFs are given")
+    parser.add_argument("--all", action="store_true", help="run over every CUAD contract")
+    parser.add_argument("--stage", choices=sorted(STAGES), action="append", help="stages to run (default: all)")
+    args = parser.parse_args()
+
+    pdfs = args.pdfs
+    if not pdfs and args.all:
+        pdfs = sorted(iter_pdfs(Config.CUAD_PDF_DIR))
+    elif not pdfs:
+        pdfs = sorted(iter_pdfs(Config.CUAD_PDF_DIR), key=lambda p: -fitz.open(p).page_count)[:args.limit]
+
+    reader = PDFReader()
+    stages = args.stage or list(STAGES)
+    totals = {stage: [0.0, 0.0] for stage in stages}
+    total_pages = 0
+
+    for pdf_path in pdfs:
+        with fitz.open(pdf_path) as doc:
+            pages = doc.page_count
+        total_pages += pages
+
+        for stage in stages:
+            t_ref, t_new = STAGES[stage](reader, pdf_path)
+            totals[stage][0] += t_ref
+            totals[stage][1] += t_new
+            print(f"{stage:<18} {pages:>4} pages  reference {1000 * t_ref / pages:8.2f} ms/page"
+                  f"  vectorized {1000 * t_new / pages:8.2f} ms/page  {str(pdf_path)[-60:]}")
+
+    print(f"\n{len(pdfs)} documents, {total_pages} pages")
+    for stage, (t_ref, t_new) in totals.items():
+        print(f"{stage:<18} reference {1000 * t_ref / total_pages:8.2f} ms/page"
+              f"  vectorized {1000 * t_new / total_pages:8.2f} ms/page  speedup x{t_ref / t_new:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Bytes and milliseconds per graph for every wire format of /process, against
+the previous pydantic path (validate into Graph, dump, json.dumps).
+
+Graphs come from the result store and the graph store, largest first. Every
+format is decoded back and checked against the original graph.
+
+    cd server && python -m scripts.benchmark_serialization --limit 20
+"""
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+
+from schemas.graph import Graph
+from utils import graph_codec
+from utils.config import Config
+from utils.graph_codec import complete_edges
+
+ENCODINGS = [None, "gzip"] + (["br"] if graph_codec.brotli is not None else [])
+REPEAT = 3
+
+
+def load_graph(path: Path) -> dict:
+    with gzip.open(path, "rb") as f:
+        data = graph_codec.loads(f.read())
+    # Graph store records wrap the graph, which has no contradictions
+    graph = data.get("graph", data)
+    return {
+        "nodes": graph["nodes"],
+        "edges": complete_edges(graph["edges"]),
+        "contradictions": graph.get("contradictions", []),
+    }
+
+
+def _timed(fn, *args):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        out = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return out, best
+
+
+def pydantic_encode(graph: dict) -> bytes:
+    return json.dumps(Graph(**graph).model_dump(mode="json")).encode("utf-8")
+
+
+def bench(graph: dict, expected: dict) -> dict:
+    results = {}
+    formats = [("pydantic", None)] + [(media_type, media_type) for media_type in graph_codec.media_types()]
+    for name, media_type in formats:
+        if media_type is None:
+            body, t_encode = _timed(pydantic_encode, graph)
+            decoded, t_decode = _timed(json.loads, body)
+        else:
+            body, t_encode = _timed(graph_codec.encode, graph, media_type)
+            decoded, t_decode = _timed(graph_codec.decode, body, media_type)
+        assert decoded == expected, f"{name} does not round trip"
+
+        for encoding in ENCODINGS:
+            compressed, t_compress = _timed(graph_codec.compress, body, encoding)
+            results[(name, encoding or "identity")] = (len(compressed), t_encode + t_compress, t_decode)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("graphs", nargs="*", type=Path, help="gzipped results or graph store files (default: both stores)")
+    parser.add_argument("--limit", type=int, default=10, help="largest stored graphs to use when none are given")
+    args = parser.parse_args()
+
+    paths = args.graphs
+    if not paths:
+        stored = [p for store in (Config.RESULT_STORE_DIR, Config.GRAPH_STORE_DIR) if store.exists()
+                  for p in store.glob("*.json.gz")]
+        paths = sorted(stored, key=lambda p: -p.stat().st_size)[:args.limit]
+    if not paths:
+        parser.error("no stored graphs, process some documents or run scripts.preprocess_cuad first")
+
+    totals = {}
+    edges = 0
+    for path in paths:
+        graph = load_graph(path)
+        edges += len(graph["edges"])
+        expected = Graph(**graph).model_dump()
+        for key, (size, t_encode, t_decode) in bench(graph, expected).items():
+            total = totals.setdefault(key, [0, 0.0, 0.0])
+            total[0] += size
+            total[1] += t_encode
+            total[2] += t_decode
+        print(f"{len(graph['nodes']):>5} nodes {len(graph['edges']):>7} edges  {path.name[-70:]}")
+
+    count = len(paths)
+    baseline = totals[("pydantic", "identity")]
+    print(f"\n{count} graphs, {edges / count:.0f} edges on average, per graph:")
+    print(f"{'format':<38} {'encoding':<9} {'KiB':>9} {'encode ms':>10} {'decode ms':>10} {'size':>7} {'speedup':>8}")
+    for (name, encoding), (size, t_encode, t_decode) in totals.items():
+        print(f"{name:<38} {encoding:<9} {size / count / 1024:9.1f} {1000 * t_encode / count:10.2f}"
+              f" {1000 * t_decode / count:10.2f} {size / baseline[0]:7.2f} x{baseline[1] / t_encode:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Parse, embed and build the graph of every CUAD contract ahead of time.
+
+Results go to the parse cache and the graph store, so /process serves these
+documents without re-running the pipeline and /list_documents reports them as
+processed. Progress is kept in a manifest next to the graphs: an interrupted
+run picks up where it stopped.
+
+    cd server && python -m scripts.preprocess_cuad --workers 8
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import fitz
+
+from utils.config import Config
+from utils.document_model import DocumentModel
+from utils.embedding_cache import EmbeddingCache
+from utils.models import ModelRegistry
+from utils.parse_cache import ParseCache
+from utils.result_store import ResultStore
+from utils.pdf_reader import PDFReader
+from utils.pipeline import graph_fingerprint
+from utils.relations import generate_graph_data
+from utils.utils import file_sha256, iter_pdfs
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = Config.GRAPH_STORE_DIR / "manifest.json"
+
+STAGES = ["hash", "parse", "graph", "store"]
+
+_reader = None
+_parse_cache = None
+_graph_store = None
+_encoder = None
+_embedding_cache = None
+
+
+def _init_worker():
+    global _reader, _parse_cache, _graph_store, _encoder, _embedding_cache
+    _reader = PDFReader()
+    _parse_cache = ParseCache(Config.PARSE_CACHE_DIR, Config.PARSE_CACHE_MAX_BYTES, Config.PIPELINE_VERSION)
+    _graph_store = ResultStore(Config.GRAPH_STORE_DIR, graph_fingerprint(_reader))
+    # One model per worker, loaded before the first contract
+    _encoder = ModelRegistry().get_encoder()
+    _embedding_cache = EmbeddingCache(Config.EMBEDDING_CACHE_DIR, Config.EMBEDDING_MODEL, Config.EMBEDDING_CACHE_MEMORY_ITEMS)
+
+
+def _process(pdf_path):
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(stage):
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage] = now - start
+        start = now
+
+    document_id = pdf_path.stem
+    pdf_sha256 = file_sha256(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        pages = doc.page_count
+    lap("hash")
+
+    df_paragraphs, _ = _parse_cache.get_or_parse(pdf_path, _reader, pdf_sha256)
+    lap("parse")
+
+    graph = generate_graph_data(DocumentModel.from_dataframe(df_paragraphs, document_id), _encoder, _embedding_cache)
+    lap("graph")
+
+    _graph_store.save(document_id, pdf_sha256, graph)
+    lap("store")
+
+    return document_id, {
+        "pdf_sha256": pdf_sha256,
+        "fingerprint": _graph_store.fingerprint,
+        "pages": pages,
+        "nodes": len(graph["nodes"]),
+        "edges": len(graph["edges"]),
+        "timings": timings,
+    }
+
+
+def load_manifest() -> dict:
+    try:
+        return json.loads(MANIFEST.read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest: dict):
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=MANIFEST.parent, prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--limit", type=int, help="process at most this many pending contracts")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    manifest = {} if args.force else load_manifest()
+    graph_store = ResultStore(Config.GRAPH_STORE_DIR, graph_fingerprint(PDFReader()))
+
+    pdfs = sorted(iter_pdfs(Config.CUAD_PDF_DIR))
+    pending = [
+        p for p in pdfs
+        if manifest.get(p.stem, {}).get("fingerprint") != graph_store.fingerprint
+        or not graph_store.has(p.stem)
+    ]
+    logger.info(f"{len(pdfs)} contracts, {len(pdfs) - len(pending)} already done, {len(pending)} pending")
+    if args.limit is not None:
+        pending = pending[:args.limit]
+
+    totals = dict.fromkeys(STAGES, 0.0)
+    done = failed = pages = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_process, pdf_path): pdf_path for pdf_path in pending}
+
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                document_id, entry = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to process {pdf_path.name}: {e}")
+                continue
+
+            manifest[document_id] = entry
+            save_manifest(manifest)
+
+            done += 1
+            pages += entry["pages"]
+            for stage, seconds in entry["timings"].items():
+                totals[stage] += seconds
+            logger.info(f"[{done + failed}/{len(pending)}] {document_id}: {entry['pages']} pages, "
+                        f"{entry['nodes']} nodes, {entry['edges']} edges")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{done} processed, {failed} failed in {elapsed:.1f}s")
+    if done:
+        print(f"throughput: {done / elapsed:.2f} docs/s, {pages / elapsed:.2f} pages/s")
+        for stage in STAGES:
+            print(f"  {stage:<6} {totals[stage]:8.1f}s total  {1000 * totals[stage] / done:8.1f} ms/doc")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parents[1]
+CUAD_PDF_DIR = SERVER_DIR.parent / "infra" / "CUAD_v1" / "full_contract_pdf"
+
+# Tests import the server packages the way main.py does
+sys.path.insert(0, str(SERVER_DIR))
+
+# A few CUAD contracts: short and long ones, and one with images between text blocks
+FIXTURE_PDFS = [
+    "Part_III/Sponsorship/TICKETSCOMINC_06_22_1999-EX-10.22-SPONSORSHIP AGREEMENT.PDF",
+    "Part_II/Supply/FLOTEKINDUSTRIESINCCN_05_09_2019-EX-10.1-SUPPLY AGREEMENT.PDF",
+    "Part_III/Collaboration/LEJUHOLDINGSLTD_03_12_2014-EX-10.34-INTERNET CHANNEL COOPERATION AGREEMENT.PDF",
+    "Part_II/Collaboration/XENCORINC_10_25_2013-EX-10.24-COLLABORATION AGREEMENT (3).PDF",
+]
+
+
+@pytest.fixture(params=FIXTURE_PDFS, ids=lambda name: Path(name).stem[:40])
+def cuad_pdf(request) -> str:
+    path = CUAD_PDF_DIR / request.param
+    if not path.exists():
+        pytest.skip(f"CUAD contract not available: {request.param}")
+    return str(path)
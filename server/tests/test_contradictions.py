@@ -0,0 +1,154 @@
+"""
+ContradictionClassifier's request planning against a stub chat client: one
+verdict per unordered pair, batched prompts and the single-pair fallback.
+"""
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from utils.contradictions import ContradictionClassifier
+from utils.verdict_cache import text_hash
+
+BATCH_PARAGRAPH = re.compile(r"^\[(P\d+)\]\n(.*?)(?=\n\n\[P\d+\]\n|\n\nPairs to check:)", re.MULTILINE | re.DOTALL)
+BATCH_PAIR = re.compile(r"^\[(\d+)\] A = (P\d+), B = (P\d+)$", re.MULTILINE)
+SINGLE = re.compile(r"^Paragraph A:\n(.*)\n\nParagraph B:\n(.*?)\n\nTask:", re.DOTALL)
+
+
+def _verdict(a, b):
+    # The whole paragraphs as evidence, so the test can tell which side is which
+    return {"label": "contradiction", "type": "other", "confidence": 0.9, "evidence": {"source": a, "target": b}}
+
+
+class StubCompletions:
+    """
+    Answers the classifier's prompts like the model would. omit lists pair
+    numbers left out of batched answers, garble answers every batch with text
+    that is no JSON.
+    """
+
+    def __init__(self, omit=(), garble=False):
+        self.omit = set(omit)
+        self.garble = garble
+        self.batches = []
+        self.singles = []
+
+    async def create(self, model, temperature, messages, max_tokens):
+        prompt = messages[-1]["content"]
+        single = SINGLE.match(prompt)
+        if single:
+            a, b = single.groups()
+            self.singles.append((a, b))
+            content = json.dumps(_verdict(a, b))
+        else:
+            paragraphs = dict(BATCH_PARAGRAPH.findall(prompt))
+            pairs = [(int(i), paragraphs[a], paragraphs[b]) for i, a, b in BATCH_PAIR.findall(prompt)]
+            self.batches.append((paragraphs, [(a, b) for _, a, b in pairs]))
+            answer = [{"pair": i, **_verdict(a, b)} for i, a, b in pairs if i not in self.omit]
+            content = "Sorry, here are the verdicts: [" if self.garble else json.dumps(answer)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def _classifier(completions, pairs_per_request=8, max_prompt_chars=12000):
+    classifier = ContradictionClassifier(
+        verdict_cache=None,
+        pairs_per_request=pairs_per_request,
+        max_prompt_chars=max_prompt_chars,
+        requests_per_minute=100000,
+        tokens_per_minute=100000000,
+    )
+    classifier.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return classifier
+
+
+def _classify(classifier, pairs):
+    async def collect():
+        return [item async for item in classifier.classify_iter(pairs, deadline=30)]
+    return dict(asyncio.run(collect()))
+
+
+def _canonical(a, b):
+    return frozenset((a, b))
+
+
+PARAGRAPHS = [f"Paragraph {i}. " + "The Supplier shall deliver the goods. " * (i + 1) for i in range(6)]
+
+
+def test_reversed_and_repeated_pairs_collapse_to_one_verdict():
+    a, b, c = PARAGRAPHS[:3]
+    completions = StubCompletions()
+    pairs = [(a, b), (b, a), (a, b), (b, c)]
+
+    results = _classify(_classifier(completions), pairs)
+
+    assert sorted(results) == [0, 1, 2, 3]
+    [(_, asked)] = completions.batches
+    assert len(asked) == 2
+    assert {_canonical(*p) for p in asked} == {_canonical(a, b), _canonical(b, c)}
+    assert completions.singles == []
+
+
+def test_evidence_swapped_back_for_reversed_pairs():
+    a, b = PARAGRAPHS[:2]
+    pairs = [(a, b), (b, a)]
+
+    results = _classify(_classifier(StubCompletions()), pairs)
+
+    # Whichever order the pair was asked in, evidence sides follow the caller's pair
+    for position, (source, target) in enumerate(pairs):
+        assert results[position]["evidence"] == {"source": source, "target": target}
+
+
+@pytest.mark.parametrize("stub", [{"omit": {1, 3}}, {"garble": True}], ids=["omitted", "garbled"])
+def test_pairs_missing_from_batch_answer_asked_alone(stub):
+    completions = StubCompletions(**stub)
+    pairs = [(PARAGRAPHS[0], PARAGRAPHS[i]) for i in range(1, 6)]
+
+    results = _classify(_classifier(completions), pairs)
+
+    assert sorted(results) == list(range(len(pairs)))
+    for position, (source, target) in enumerate(pairs):
+        assert results[position]["evidence"] == {"source": source, "target": target}
+
+    [(_, asked)] = completions.batches
+    if completions.garble:
+        missing = set(asked)
+    else:
+        missing = {pair for i, pair in enumerate(asked) if i in completions.omit}
+    assert {_canonical(*p) for p in completions.singles} == {_canonical(*p) for p in missing}
+
+
+@pytest.mark.parametrize("pairs_per_request, max_prompt_chars", [(8, 400), (8, 1000), (3, 12000), (1, 12000)])
+def test_plan_respects_request_limits(pairs_per_request, max_prompt_chars):
+    texts = {text_hash(p): p for p in PARAGRAPHS}
+    hashes = sorted(texts)
+    pairs = [(x, y) for i, x in enumerate(hashes) for y in hashes[i + 1:]]
+    classifier = _classifier(StubCompletions(), pairs_per_request, max_prompt_chars)
+
+    batches = classifier._plan(pairs, texts)
+
+    # Every pair planned exactly once
+    assert sorted(p for batch in batches for p in batch) == sorted(pairs)
+    for batch in batches:
+        assert len(batch) <= pairs_per_request
+        chars = sum(len(texts[h]) for h in {h for pair in batch for h in pair})
+        # A pair too long on its own still goes, alone
+        assert chars <= max_prompt_chars or len(batch) == 1
+
+
+def test_batched_prompts_respect_max_prompt_chars():
+    max_prompt_chars = 600
+    completions = StubCompletions()
+    pairs = [(x, y) for i, x in enumerate(PARAGRAPHS) for y in PARAGRAPHS[i + 1:]]
+
+    results = _classify(_classifier(completions, max_prompt_chars=max_prompt_chars), pairs)
+
+    assert sorted(results) == list(range(len(pairs)))
+    assert len(completions.batches) > 1
+    for paragraphs, asked in completions.batches:
+        assert sum(map(len, paragraphs.values())) <= max_prompt_chars
+        # Each paragraph is listed once however many pairs it is in
+        assert len(paragraphs) == len({p for pair in asked for p in pair})
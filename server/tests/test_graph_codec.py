@@ -0,0 +1,39 @@
+import pytest
+
+from utils import graph_codec
+from utils.graph_codec import content_encoding
+
+
+@pytest.fixture(params=[True, False], ids=["brotli", "no-brotli"])
+def has_brotli(request, monkeypatch) -> bool:
+    # Only whether brotli is importable matters to the negotiation
+    monkeypatch.setattr(graph_codec, "brotli", object() if request.param else None)
+    return request.param
+
+
+@pytest.mark.parametrize("header, with_brotli, without_brotli", [
+    (None, None, None),
+    ("", None, None),
+    ("identity", None, None),
+    ("gzip", "gzip", "gzip"),
+    ("br", "br", None),
+    ("gzip, deflate, br", "br", "gzip"),
+    ("gzip;q=1.0, br;q=0.5", "gzip", "gzip"),
+    ("br;q=0.9, gzip;q=0.8", "br", "gzip"),
+    # q=0 refuses a coding, explicitly or through the wildcard
+    ("br;q=0, gzip", "gzip", "gzip"),
+    ("gzip;q=0, br;q=0", None, None),
+    ("gzip;q=0", None, None),
+    ("br;q=0, *", "gzip", "gzip"),
+    ("gzip;q=0, *", "br", None),
+    ("*;q=0", None, None),
+    ("*;q=0, gzip", "gzip", "gzip"),
+    # The wildcard only stands for codings the header does not name
+    ("*", "br", "gzip"),
+    ("gzip;q=0.5, *", "br", "gzip"),
+    ("br;q=0.3, *;q=0.6", "gzip", "gzip"),
+    ("gzip;q=0.2, *;q=0.6", "br", "gzip"),
+    ("GZIP;Q=0, BR", "br", None),
+])
+def test_content_encoding(has_brotli, header, with_brotli, without_brotli):
+    assert content_encoding(header) == (with_brotli if has_brotli else without_brotli)
@@ -0,0 +1,72 @@
+"""
+The vectorized PDFReader stages against the reference implementations they
+replace, frame for frame on CUAD contracts.
+"""
+import fitz
+import pandas as pd
+import pytest
+
+from utils.pdf_reader import PDFReader
+
+
+@pytest.fixture(scope="module")
+def reader():
+    return PDFReader()
+
+
+@pytest.fixture(scope="module")
+def parallel_reader():
+    reader = PDFReader(WORKERS=2)
+    yield reader
+    reader.close()
+
+
+def test_read_pdf_columnar_matches_read_pdf(reader, cuad_pdf):
+    pd.testing.assert_frame_equal(reader.read_pdf(cuad_pdf), reader.read_pdf_columnar(cuad_pdf))
+
+
+def test_set_lines_vectorized_matches_set_lines(reader, cuad_pdf):
+    pdf_df = reader.read_pdf_columnar(cuad_pdf)
+    pd.testing.assert_frame_equal(reader.set_lines(pdf_df), reader.set_lines_vectorized(pdf_df))
+
+
+def test_set_paragraphs_vectorized_matches_intelligent(reader, cuad_pdf):
+    df_lines = reader.filter_lines(reader.set_lines_vectorized(reader.read_pdf_columnar(cuad_pdf)))
+    pd.testing.assert_frame_equal(
+        reader.set_paragraphs_intelligent(df_lines),
+        reader.set_paragraphs_vectorized(df_lines),
+    )
+
+
+def test_filter_paragraphs_matches_reference(reader, cuad_pdf):
+    df_lines = reader.filter_lines(reader.set_lines_vectorized(reader.read_pdf_columnar(cuad_pdf)))
+    df_paragraphs = reader.set_paragraphs_vectorized(df_lines)
+    pd.testing.assert_frame_equal(
+        PDFReader(ENGINE="reference").filter_paragraphs(df_paragraphs),
+        reader.filter_paragraphs(df_paragraphs),
+    )
+
+
+def test_mark_repetitions_blocked_matches_exhaustive(reader, cuad_pdf):
+    df_lines = reader.filter_lines(reader.set_lines_vectorized(reader.read_pdf_columnar(cuad_pdf)))
+    df = reader.set_paragraphs_vectorized(df_lines)
+    # The columns filter_paragraphs prepares before looking for repetitions
+    df["clean_text"] = df["text"].str.replace(r"\s+", " ", regex=True).str.strip()
+    df["text_wo_numbers"] = df["text"].str.replace(r"\d*", "", regex=True)
+
+    # Tiles far smaller than the document, hits have to carry across them
+    exhaustive, blocked = df.copy(), df.copy()
+    similar_exhaustive = reader._mark_repetitions_exhaustive(exhaustive)
+    similar_blocked = reader._mark_repetitions_blocked(blocked, tile_rows=7)
+
+    assert sorted(similar_exhaustive) == sorted(similar_blocked)
+    pd.testing.assert_frame_equal(exhaustive, blocked)
+
+
+def test_parallel_matches_serial(reader, parallel_reader, cuad_pdf):
+    with fitz.open(cuad_pdf) as doc:
+        page_count = doc.page_count
+    # Called directly, PDF_to_dataframe keeps short documents off the pool
+    parallel = parallel_reader.PDF_to_dataframe_parallel(cuad_pdf, page_count)
+    for serial_df, parallel_df in zip(reader.PDF_to_dataframe(cuad_pdf), parallel):
+        pd.testing.assert_frame_equal(serial_df, parallel_df)
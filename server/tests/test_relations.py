@@ -0,0 +1,158 @@
+"""
+Edges built from paragraph texts and embeddings, against the loops they replace.
+"""
+import pytest
+import torch
+from sentence_transformers import util
+
+from utils.relations import (
+    SIMILARITY_THRESHOLD, SIMILARITY_TILE_ROWS, label_index, reference_edges, similarity_edges,
+)
+from utils.static import REFERENCE_PATTERN, REFERENCE_PATTERNS
+
+# Tiles and the full matrix may round a float32 score differently in the last bits
+SCORE_TOLERANCE = 1e-6
+
+
+TEXTS = [
+    "1. Definitions. Terms used in Section 4.2 have the meaning in Exhibit A.",
+    "4. Payment",
+    "4.2 Fees are listed in Schedule B and in section 4.2.1, see also Section 4.2.",
+    "4.2.1 Late fees accrue as set out in Article 4 and Annex B.",
+    "40 days after delivery the Appendix C terms apply.",
+    "A. Price list, as amended under Section 4.",
+    "B. Discounts",
+    "C. Support terms of Exhibit A and section 1",
+]
+
+
+def old_reference_edges(ids, texts):
+    """The pattern by pattern, node by node loop reference_edges replaced."""
+    edges = []
+    for node_id, text in zip(ids, texts):
+        for ref_type, pattern in REFERENCE_PATTERNS:
+            for match in pattern.finditer(text):
+                ref_id = match.group(1)
+                for target_id, target_text in zip(ids, texts):
+                    if target_id != node_id and target_text.startswith(ref_id):
+                        edges.append((node_id, target_id, ref_type, ref_id))
+    return edges
+
+
+def cos_sim_edges(embeddings, node_ids):
+    """The full matrix double loop similarity_edges replaced."""
+    cosine_scores = util.cos_sim(embeddings, embeddings)
+    edges = []
+    for i in range(len(node_ids)):
+        for j in range(i + 1, len(node_ids)):
+            if cosine_scores[i][j] > SIMILARITY_THRESHOLD:
+                edges.append((node_ids[i], node_ids[j], float(cosine_scores[i][j])))
+    return edges, cosine_scores
+
+
+def clustered_embeddings(n, seed=0):
+    """Points around a few centers, so a good share of the pairs are edges."""
+    generator = torch.Generator().manual_seed(seed)
+    centers = torch.randn(max(n // 20, 1), 64, generator=generator)
+    members = torch.randint(len(centers), (n,), generator=generator)
+    return centers[members] + 0.3 * torch.randn(n, 64, generator=generator)
+
+
+@pytest.mark.parametrize("n, tile_rows", [
+    (1, 16),
+    (5, 16),
+    (16, 16),
+    (17, 16),
+    (40, 16),
+    (47, 16),
+    (100, SIMILARITY_TILE_ROWS),
+    (300, SIMILARITY_TILE_ROWS),
+    (600, SIMILARITY_TILE_ROWS),
+])
+def test_similarity_edges_match_cos_sim(n, tile_rows):
+    embeddings = clustered_embeddings(n)
+    node_ids = [f"p{i}" for i in range(n)]
+    expected, cosine_scores = cos_sim_edges(embeddings, node_ids)
+
+    # A pair within the tolerance of the threshold could fall on either side
+    near = (cosine_scores - SIMILARITY_THRESHOLD).abs() <= SCORE_TOLERANCE
+    assert not near.triu(diagonal=1).any()
+
+    edges = similarity_edges(embeddings, node_ids, tile_rows=tile_rows)
+
+    assert [(e["source"], e["target"]) for e in edges] == [(s, t) for s, t, _ in expected]
+    assert [e["score"] for e in edges] == pytest.approx([s for _, _, s in expected], abs=SCORE_TOLERANCE)
+    assert all(e["type"] == "semantic_similarity" for e in edges)
+
+
+@pytest.mark.parametrize("text, label, value", [
+    ("under Section 1.4.2 of", "section", "1.4.2"),
+    ("see section 3", "section", "3"),
+    ("Article 16 applies", "article", "16"),
+    ("in Exhibit A", "exhibit", "A"),
+    ("exhibit 10.1", "exhibit", "10.1"),
+    ("Schedule 1", "schedule", "1"),
+    ("Annex B", "annex", "B"),
+    ("Appendix C", "appendix", "C"),
+])
+def test_reference_pattern_label_group(text, label, value):
+    [match] = REFERENCE_PATTERN.finditer(text)
+    # One named group per label, lastgroup tells which pattern matched
+    assert match.lastgroup == label
+    assert match.group(label) == value
+
+
+def test_label_index_prefixes():
+    index = label_index(TEXTS)
+    assert index["4"] == [1, 2, 3, 4]
+    assert index["4.2"] == [2, 3]
+    assert index["4.2.1"] == [3]
+    assert index["40"] == [4]
+    assert index["1"] == [0]
+    assert index["A"] == [5]
+    assert index["B"] == [6]
+    # "4." is no label, nor are letters of longer words
+    assert "4." not in index
+    assert "D" not in index
+
+
+def test_label_index_matches_startswith():
+    index = label_index(TEXTS)
+    for match in REFERENCE_PATTERN.finditer(" ".join(TEXTS)):
+        ref_id = match.group(match.lastgroup)
+        assert index.get(ref_id, []) == [i for i, text in enumerate(TEXTS) if text.startswith(ref_id)]
+
+
+def test_reference_edges_keep_first_citation():
+    ids = ["p0", "p1", "p2"]
+    texts = ["See Section 4 and Section 4.2.", "4.2 Fees", "4. Payment"]
+    edges = reference_edges(ids, texts)
+    # p1 starts with both "4" and "4.2", the first citation gives its ref_value
+    assert [(e["source"], e["target"], e["ref_label"], e["ref_value"]) for e in edges] == [
+        ("p0", "p1", "section", "4"),
+        ("p0", "p2", "section", "4"),
+    ]
+
+
+def test_reference_edges_pattern_order():
+    ids = ["p0", "p1", "p2"]
+    texts = ["Annex B, Exhibit A, Article 2 and Section 2", "A. Terms", "B. Rates"]
+    edges = reference_edges(ids, texts)
+    assert [(e["target"], e["ref_label"]) for e in edges] == [("p1", "exhibit"), ("p2", "annex")]
+
+
+def test_reference_edges_match_old_loop():
+    ids = [f"p{i}" for i in range(len(TEXTS))]
+    edges = reference_edges(ids, TEXTS)
+
+    # The old loop, with repeated (source, target, label) triples dropped
+    seen = set()
+    expected = []
+    for source, target, label, value in old_reference_edges(ids, TEXTS):
+        if (source, target, label) not in seen:
+            seen.add((source, target, label))
+            expected.append((source, target, label, value))
+
+    assert [(e["source"], e["target"], e["ref_label"], e["ref_value"]) for e in edges] == expected
+    assert len(expected) < len(old_reference_edges(ids, TEXTS))
+    assert all(e["type"] == "reference" and e["score"] is None for e in edges)
@@ -0,0 +1,199 @@
+"""
+The rule based contradiction detector: what it extracts from a paragraph, the
+conflicts it reports and the look-alikes it has to leave alone.
+"""
+from datetime import date
+
+import pytest
+
+from utils.rules import RULE_CONFIDENCE, compare_facts, detect_conflicts, extract_facts
+
+
+def _quantities(text):
+    return [(kind, value) for kind, value, _, _ in extract_facts(text)["quantities"]]
+
+
+def _compare(a, b):
+    return compare_facts(extract_facts(a), extract_facts(b))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Payment is due within thirty (30) days of receipt of the invoice.", [("days", 30)]),
+    ("Payment is due within ninety days of receipt of the invoice.", [("days", 90)]),
+    ("The Agreement renews for successive 2 year terms.", [("days", 730)]),
+    ("Either party may terminate on 3 months notice.", [("days", 90)]),
+    ("Supplier shall ship the goods within a 60-day window.", [("days", 60)]),
+    ("Supplier shall ship the goods within 10 business days of the order.", [("business_days", 10)]),
+    ("Supplier shall ship the goods within 5 working days of the order.", [("business_days", 5)]),
+    ("The fee is $1,000,000 payable upfront.", [("usd", 1_000_000)]),
+    ("The fee is US$ 2.5 million per year.", [("usd", 2_500_000)]),
+    ("The fee is $750 thousand per year.", [("usd", 750_000)]),
+    ("A royalty of 15% of net sales.", [("percent", 15)]),
+    ("Interest accrues at 2.5 percent per annum.", [("percent", 2.5)]),
+    ("This Agreement terminates on January 1, 2020.", [("date", date(2020, 1, 1).toordinal())]),
+    ("This Agreement terminates on February 30, 2020.", []),
+])
+def test_extract_quantities(text, expected):
+    assert _quantities(text) == expected
+
+
+def test_quantity_context_and_evidence():
+    text = "The first clause applies. Payment is due within 30 days of receipt of the invoice; late fees apply."
+    [(_, _, context, span)] = extract_facts(text)["quantities"]
+    assert context == {"payment", "due", "receipt", "invoice"}
+    # Evidence is the clause around the match, an exact substring of the paragraph
+    assert span == "Payment is due within 30 days of receipt of the invoice"
+    assert span in text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Licensee shall not assign this Agreement to any third party.",
+     ("licensee", "assign", {"agreement", "third", "party"}, "prohibition")),
+    ("Licensee may assign this Agreement to any third party.",
+     ("licensee", "assign", {"agreement", "third", "party"}, "permission")),
+    ("Distributor must pay all invoices promptly.",
+     ("distributor", "pay", {"invoice", "promptly"}, "obligation")),
+    ("Licensee shall be required to install the Software.",
+     ("licensee", "install", {"software"}, "obligation")),
+    ("Company will not be required to indemnify the Reseller.",
+     ("company", "indemnify", {"reseller"}, "prohibition")),
+])
+def test_extract_modals(text, expected):
+    [(subject, action, obj, polarity, span)] = extract_facts(text)["modals"]
+    assert (subject, action, obj, polarity) == expected
+    assert span in text
+
+
+def test_modals_skip_pronoun_subjects():
+    assert extract_facts("It shall pay the fee. Which may include taxes.")["modals"] == []
+
+
+@pytest.mark.parametrize("text, item", [
+    ("(b) The fee is $500 per unit.", "b"),
+    ("iii) The fee is $500 per unit.", "iii"),
+    ("4. The fee is $500 per unit.", "4"),
+    ("3.5.2 The fee is $500 per unit.", "3.5.2"),
+    ("The fee is $500 per unit.", None),
+])
+def test_extract_list_item(text, item):
+    assert extract_facts(text)["item"] == item
+
+
+@pytest.mark.parametrize("a, b, summary", [
+    ("Payment is due within 30 days of receipt of the invoice.",
+     "Payment is due within 45 days of receipt of the invoice.",
+     "Different days for the same term: 30 vs 45"),
+    ("Payment is due within thirty (30) days of receipt of the invoice.",
+     "Payment is due within 2 months of receipt of the invoice.",
+     "Different days for the same term: 30 vs 60"),
+    ("The Distributor shall pay an annual license fee of $50,000 to the Company.",
+     "The Distributor shall pay an annual license fee of $75,000 to the Company.",
+     "Different USD amounts for the same term: 50,000 vs 75,000"),
+    ("The Licensee pays a royalty of 5% of net sales of Products.",
+     "The Licensee pays a royalty of 7.5% of net sales of Products.",
+     "Different percentages for the same term: 5 vs 7.50"),
+    ("The initial term of this Agreement expires on January 1, 2020 unless renewed.",
+     "The initial term of this Agreement expires on June 30, 2021 unless renewed.",
+     "Different dates for the same term: 2020-01-01 vs 2021-06-30"),
+])
+def test_numeric_conflict(a, b, summary):
+    verdict = _compare(a, b)
+    assert verdict["label"] == "contradiction"
+    assert verdict["type"] == "numeric"
+    assert verdict["confidence"] == RULE_CONFIDENCE
+    assert verdict["detector"] == "rules"
+    assert verdict["summary"] == summary
+    assert verdict["evidence"]["source"] in a and verdict["evidence"]["target"] in b
+
+
+def test_numeric_same_value_is_no_conflict():
+    assert _compare(
+        "Payment is due within thirty (30) days of receipt of the invoice.",
+        "Payment is due within 30 days of receipt of the invoice.",
+    ) is None
+
+
+def test_numeric_business_days_are_not_calendar_days():
+    assert _compare(
+        "Payment is due within 30 days of receipt of the invoice.",
+        "Payment is due within 30 business days of receipt of the invoice.",
+    ) is None
+
+
+def test_numeric_value_stated_elsewhere_in_other_paragraph():
+    # A cap and a sub-cap, the other paragraph states both
+    assert _compare(
+        "Payment is due within 30 days of receipt of the invoice.",
+        "Payment is due within 30 days of receipt of the invoice, or within 45 days of receipt of the invoice for disputed amounts.",
+    ) is None
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Licensee shall not assign this Agreement to any third party.",
+     "Licensee may assign this Agreement to any third party."),
+    ("Distributor must disclose the Confidential Information to its auditors.",
+     "Distributor shall not disclose the Confidential Information to its auditors."),
+])
+def test_deontic_conflict(a, b):
+    verdict = _compare(a, b)
+    assert verdict["type"] == "deontic"
+    assert verdict["detector"] == "rules"
+    assert verdict["evidence"] == {"source": a, "target": b}
+
+
+def test_deontic_wins_over_numeric():
+    verdict = _compare(
+        "Licensee shall not assign this Agreement to any third party. Payment is due within 30 days of receipt of the invoice.",
+        "Licensee may assign this Agreement to any third party. Payment is due within 45 days of receipt of the invoice.",
+    )
+    assert verdict["type"] == "deontic"
+
+
+@pytest.mark.parametrize("a, b", [
+    # Permission and obligation do not conflict, only a prohibition does
+    ("Licensee may assign this Agreement to any third party.",
+     "Licensee shall assign this Agreement to any third party."),
+    # Different objects of the same verb
+    ("Supplier shall not provide monthly reports.",
+     "Supplier shall provide technical support."),
+    # Different subjects
+    ("Licensee shall not assign this Agreement to any third party.",
+     "Licensor may assign this Agreement to any third party."),
+])
+def test_deontic_no_conflict(a, b):
+    assert _compare(a, b) is None
+
+
+@pytest.mark.parametrize("a, b", [
+    # Sibling items of a fee schedule
+    ("(b) The Distributor shall pay an annual license fee of $50,000 to the Company.",
+     "(c) The Distributor shall pay an annual license fee of $75,000 to the Company."),
+    # Sibling numbered clauses
+    ("3.5.2 Payment is due within 30 days of receipt of the invoice.",
+     "3.5.3 Payment is due within 45 days of receipt of the invoice."),
+    ("3.5.2 Licensee shall not assign this Agreement to any third party.",
+     "3.5.3 Licensee may assign this Agreement to any third party."),
+    # Quantities about different terms
+    ("Payment is due within 30 days of receipt of the invoice.",
+     "Either party may terminate this Agreement on 90 days written notice."),
+    ("The Distributor shall pay an annual license fee of $50,000 to the Company.",
+     "The Company shall maintain insurance coverage of at least $1,000,000."),
+])
+def test_false_positive_guards(a, b):
+    assert _compare(a, b) is None
+
+
+def test_same_list_item_still_compared():
+    verdict = _compare(
+        "(b) The Distributor shall pay an annual license fee of $50,000 to the Company.",
+        "(b) The Distributor shall pay an annual license fee of $75,000 to the Company.",
+    )
+    assert verdict["type"] == "numeric"
+
+
+def test_detect_conflicts_aligned_with_candidates():
+    a = "Payment is due within 30 days of receipt of the invoice."
+    b = "Payment is due within 45 days of receipt of the invoice."
+    c = "The Company shall maintain insurance coverage of at least $1,000,000."
+    results = detect_conflicts([({}, a, b), ({}, a, c), ({}, b, a)])
+    assert [r and r["type"] for r in results] == ["numeric", None, "numeric"]
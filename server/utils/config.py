@@ -1,4 +1,77 @@
+import os
 from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
 
 class Config:
-  CUAD_PDF_DIR = Path("../infra/CUAD_v1/full_contract_pdf")
\ No newline at end of file
+  CUAD_PDF_DIR = Path("../infra/CUAD_v1/full_contract_pdf")
+
+  # Process pool size for PDF parsing, 1 keeps parsing on the request thread
+  PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+  # Threads scoring repeated paragraphs against each other, -1 uses every core
+  PDF_MATCH_THREADS = int(os.getenv("PDF_MATCH_THREADS", "1"))
+
+  # Bump when a pipeline change invalidates cached results
+  PIPELINE_VERSION = "1"
+
+  PARSE_CACHE_DIR = Path(os.getenv("PARSE_CACHE_DIR", "cache/parse"))
+  PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+  GRAPH_STORE_DIR = Path(os.getenv("GRAPH_STORE_DIR", "cache/graphs"))
+  # Uploaded PDFs, stored by content hash
+  UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "cache/uploads"))
+  UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024**2)))
+
+  # Final /process results, served by GET /{document_id}/graph
+  RESULT_STORE_DIR = Path(os.getenv("RESULT_STORE_DIR", "cache/results"))
+  # Stored graphs kept indexed in memory for the node and edge queries
+  GRAPH_INDEX_CACHE_ITEMS = int(os.getenv("GRAPH_INDEX_CACHE_ITEMS", "32"))
+
+  # Documents processed at once in the background, and how many more may wait
+  JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+  JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+  # Seconds a finished job and its result stay available from /jobs/{id}
+  JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+  # Sentence encoder shared by every request, see utils/models.py
+  EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+  EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None
+  EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+  EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+  EMBEDDING_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR", "cache/embeddings"))
+  EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "50000"))
+
+  # OpenAI compatible API used to classify contradictions, base URL can point at a local stub
+  OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+  LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+  LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+  LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+  LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+  LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+  # Candidate pairs packed into one prompt, and the paragraph text it may carry
+  LLM_PAIRS_PER_REQUEST = int(os.getenv("LLM_PAIRS_PER_REQUEST", "8"))
+  LLM_MAX_PROMPT_CHARS = int(os.getenv("LLM_MAX_PROMPT_CHARS", "12000"))
+  # Seconds a /process request may spend classifying candidate pairs
+  LLM_DOCUMENT_DEADLINE = float(os.getenv("LLM_DOCUMENT_DEADLINE", "120"))
+
+  VERDICT_CACHE_PATH = Path(os.getenv("VERDICT_CACHE_PATH", "cache/verdicts.sqlite3"))
+  VERDICT_CACHE_TTL_SECONDS = float(os.getenv("VERDICT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+  VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "500000"))
+
+  # Deterministic numeric/deontic detector run before the LLM, see utils/rules.py
+  RULES_ENABLED = os.getenv("RULES_ENABLED", "true").lower() in ("1", "true", "yes")
+
+  # Local NLI cross-encoder that decides which candidate pairs are worth an LLM call
+  PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "true").lower() in ("1", "true", "yes")
+  PRESCREEN_MODEL = os.getenv("PRESCREEN_MODEL", "cross-encoder/nli-deberta-v3-xsmall")
+  PRESCREEN_BATCH_SIZE = int(os.getenv("PRESCREEN_BATCH_SIZE", "32"))
+  # Contradiction probability a pair needs to be escalated
+  PRESCREEN_THRESHOLD = float(os.getenv("PRESCREEN_THRESHOLD", "0.5"))
+  # Escalate at most this many pairs per document by score, 0 for no limit
+  PRESCREEN_TOP_N = int(os.getenv("PRESCREEN_TOP_N", "0"))
+  # Hard cap on the distinct pairs (A-B and B-A count once) sent to the LLM per document, so
+  # on its calls, applied after the pre-screen's threshold and top N, or to the reference
+  # pairs first and then the most similar ones when the pre-screen is off
+  LLM_CALL_BUDGET = int(os.getenv("LLM_CALL_BUDGET", "200"))
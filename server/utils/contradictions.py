@@ -1,16 +1,29 @@
 import os
 import json
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import Counter
 from typing import Optional, Dict, Any
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI, APIConnectionError, APIStatusError, APITimeoutError
+from .config import Config
 from .static import TYPE_PRIORITY
+from .verdict_cache import VerdictCache, swap_sides, text_hash
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Without a key the service runs offline, contradictions come from utils.rules only
+client = OpenAI(api_key=OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL) if OPENAI_API_KEY else None
+
+MAX_TOKENS = 350
 
 SYSTEM = """You are a careful legal analyst.
 Your job: detect HARD contradictions between two contract paragraphs.
@@ -47,7 +60,48 @@ Return JSON with:
 }}
 """
 
+BATCH_USER_TMPL = """Paragraphs:
+{paragraphs}
+
+Pairs to check:
+{pairs}
+
+For every pair, with A and B the paragraphs it names:
+1) Decide if A and B are contradictory (hard conflict, mutually exclusive).
+2) If contradictory, classify type:
+- deontic (shall/must/may/shall not)
+- numeric (amounts, dates, days, caps)
+- scope (only/except/notwithstanding/subject to)
+- definition (term meaning conflict)
+- precedence (order of precedence between docs/exhibits)
+- other
+3) Provide evidence snippets (exact substrings) from A and B.
+
+Return a JSON array with one object per pair:
+[
+  {{
+    "pair": <pair number>,
+    "label": "contradiction" | "neutral",
+    "type": "...",
+    "confidence": 0.0-1.0,
+    "evidence": {{
+       "source": "exact snippet from A or empty",
+       "target": "exact snippet from B or empty"
+    }},
+    "summary": "one-line reason"
+  }}
+]
+"""
+
+# Part of the verdict cache key, editing the prompts invalidates cached verdicts
+PROMPT_HASH = hashlib.sha256((SYSTEM + USER_TMPL).encode("utf-8")).hexdigest()
+BATCH_PROMPT_HASH = hashlib.sha256((SYSTEM + BATCH_USER_TMPL).encode("utf-8")).hexdigest()
+# Verdicts of either prompt are cached under one hash, a pair answered in a batch is not asked alone again
+VERDICT_PROMPT_HASH = hashlib.sha256((SYSTEM + USER_TMPL + BATCH_USER_TMPL).encode("utf-8")).hexdigest()
+
 def classify_contradiction(a: str, b: str, model: str = "gpt-4o-mini") -> Dict[str, Any]:
+    if client is None:
+        raise RuntimeError("OPENAI_API_KEY is not set")
     resp = client.chat.completions.create(
         model=model,
         temperature=0,
@@ -55,12 +109,364 @@ def classify_contradiction(a: str, b: str, model: str = "gpt-4o-mini") -> Dict[s
             {"role": "system", "content": SYSTEM},
             {"role": "user", "content": USER_TMPL.format(a=a, b=b)},
         ],
-        max_tokens=350,
+        max_tokens=MAX_TOKENS,
     )
     txt = resp.choices[0].message.content.strip()
     return json.loads(txt)
 
 
+class RateLimiter:
+    """
+    Token buckets for requests and tokens per minute, shared by every request
+    to the API. acquire waits until both buckets can pay for the call.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.capacity = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.available = dict(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        for name, capacity in self.capacity.items():
+            self.available[name] = min(capacity, self.available[name] + elapsed * capacity / 60)
+
+    async def acquire(self, tokens: int):
+        cost = {"requests": 1, "tokens": min(tokens, self.capacity["tokens"])}
+
+        # One waiter at a time, calls are served in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = max(
+                    (cost[name] - self.available[name]) * 60 / self.capacity[name]
+                    for name in cost
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            for name in cost:
+                self.available[name] -= cost[name]
+
+
+class ContradictionClassifier:
+    """
+    Classifies candidate pairs concurrently against an OpenAI compatible API.
+
+    classify_many plans the calls for a document: pairs are put in a canonical
+    order and deduplicated, so A-B and B-A or a reference and a similarity edge
+    between the same paragraphs cost one verdict, and up to pairs_per_request
+    pairs go in one prompt that lists each paragraph once.
+
+    At most `concurrency` calls are in flight, the rate limiter keeps them under
+    the request and token budgets, and 429/5xx/connection errors are retried
+    with exponential backoff. Pairs still pending when the deadline passes are
+    given up on. Point OPENAI_BASE_URL at a stub server for tests and load runs.
+    With a verdict cache, pairs seen before are answered without an API call.
+    """
+
+    def __init__(
+        self,
+        model: str = Config.LLM_MODEL,
+        concurrency: int = Config.LLM_CONCURRENCY,
+        requests_per_minute: int = Config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = Config.LLM_TOKENS_PER_MINUTE,
+        max_retries: int = Config.LLM_MAX_RETRIES,
+        base_url: str | None = Config.OPENAI_BASE_URL,
+        verdict_cache: VerdictCache | None = None,
+        pairs_per_request: int = Config.LLM_PAIRS_PER_REQUEST,
+        max_prompt_chars: int = Config.LLM_MAX_PROMPT_CHARS,
+    ):
+        self.model = model
+        self.verdict_cache = verdict_cache
+        self.max_retries = max_retries
+        self.pairs_per_request = pairs_per_request
+        self.max_prompt_chars = max_prompt_chars
+        # Retries are done here, where they also go through the rate limiter
+        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=base_url, max_retries=0) if OPENAI_API_KEY else None
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+        self.usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "pairs": 0, "unique_pairs": 0}
+
+    @property
+    def offline(self) -> bool:
+        return self.client is None
+
+    async def _complete(self, messages: list[dict], max_tokens: int, usage: dict) -> str:
+        # Rough count, about four characters per token
+        tokens = sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.limiter.acquire(tokens)
+                try:
+                    resp = await self.client.chat.completions.create(
+                        model=self.model,
+                        temperature=0,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                    )
+                    break
+                except (APIConnectionError, APITimeoutError, APIStatusError) as e:
+                    status = getattr(e, "status_code", None)
+                    retryable = status is None or status == 429 or status >= 500
+                    if not retryable or attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(_retry_delay(e, attempt))
+
+        for counters in (usage, self.usage):
+            counters["requests"] += 1
+            if resp.usage is not None:
+                counters["prompt_tokens"] += resp.usage.prompt_tokens
+                counters["completion_tokens"] += resp.usage.completion_tokens
+        return resp.choices[0].message.content.strip()
+
+    def _cached(self, a: str, b: str):
+        """
+        (True, verdict) when the pair has been answered before.
+        """
+        if self.verdict_cache is None:
+            return False, None
+        return self.verdict_cache.get(self.model, VERDICT_PROMPT_HASH, a, b)
+
+    def _cached_many(self, pairs: list[tuple[str, str]]) -> list[tuple[bool, Dict[str, Any] | None]]:
+        return [self._cached(a, b) for a, b in pairs]
+
+    async def _store(self, verdicts: list[tuple[str, str, dict | None, str | None]]):
+        """
+        Caches (a, b, result, error) verdicts, off the event loop in one
+        transaction.
+        """
+        if self.verdict_cache is not None and verdicts:
+            entries = [(self.model, VERDICT_PROMPT_HASH, a, b, result, error) for a, b, result, error in verdicts]
+            await asyncio.to_thread(self.verdict_cache.put_many, entries)
+
+    async def classify(self, a: str, b: str, usage: dict | None = None, cached: bool = True) -> Dict[str, Any] | None:
+        """
+        The model's verdict for the pair, None if its answer was not valid JSON.
+        cached=False skips the verdict cache lookup, for pairs already looked up.
+        """
+        if cached:
+            hit, result = await asyncio.to_thread(self._cached, a, b)
+            if hit:
+                return result
+
+        messages = [
+            {"role": "system", "content": SYSTEM},
+            {"role": "user", "content": USER_TMPL.format(a=a, b=b)},
+        ]
+        txt = await self._complete(messages, MAX_TOKENS, usage if usage is not None else _new_usage())
+        try:
+            result = json.loads(txt)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Unparseable contradiction verdict: {e}")
+            await self._store([(a, b, None, str(e))])
+            return None
+
+        await self._store([(a, b, result, None)])
+        return result
+
+    async def _classify_batch(self, batch: list[tuple[str, str]], texts: dict, usage: dict) -> dict:
+        """
+        Verdicts for a batch of canonical pairs of paragraph hashes, from a
+        single prompt. Pairs the answer does not cover are asked one by one.
+        """
+        if len(batch) == 1:
+            a, b = batch[0]
+            return {batch[0]: await self.classify(texts[a], texts[b], usage, cached=False)}
+
+        labels = {}
+        for pair in batch:
+            for h in pair:
+                labels.setdefault(h, f"P{len(labels) + 1}")
+
+        prompt = BATCH_USER_TMPL.format(
+            paragraphs="\n\n".join(f"[{label}]\n{texts[h]}" for h, label in labels.items()),
+            pairs="\n".join(f"[{i}] A = {labels[a]}, B = {labels[b]}" for i, (a, b) in enumerate(batch)),
+        )
+        messages = [
+            {"role": "system", "content": SYSTEM},
+            {"role": "user", "content": prompt},
+        ]
+        txt = await self._complete(messages, MAX_TOKENS * len(batch), usage)
+
+        verdicts = {}
+        try:
+            answer = json.loads(txt)
+            if isinstance(answer, dict):
+                answer = answer.get("results", [])
+            for item in answer:
+                position = int(item.pop("pair"))
+                if 0 <= position < len(batch) and batch[position] not in verdicts:
+                    verdicts[batch[position]] = item
+        except (json.JSONDecodeError, TypeError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Unparseable batched contradiction verdicts, asking pair by pair: {e!r}")
+            verdicts = {}
+
+        await self._store([(texts[a], texts[b], result, None) for (a, b), result in verdicts.items()])
+
+        missing = [pair for pair in batch if pair not in verdicts]
+        if missing:
+            singles = await asyncio.gather(*(self.classify(texts[a], texts[b], usage, cached=False) for a, b in missing))
+            verdicts.update(zip(missing, singles))
+        return verdicts
+
+    def _plan(self, pairs: list[tuple[str, str]], texts: dict) -> list[list[tuple[str, str]]]:
+        """
+        Group canonical pairs into requests. Pairs are ordered by their most
+        connected paragraph, so a paragraph that appears in many pairs is sent
+        once for all of them, and a request is closed when it holds
+        pairs_per_request pairs or max_prompt_chars of paragraph text.
+        """
+        degree = Counter(h for pair in pairs for h in pair)
+        ordered = sorted(pairs, key=lambda pair: min((-degree[h], h) for h in pair) + pair)
+
+        batches = []
+        batch, seen, chars = [], set(), 0
+        for pair in ordered:
+            added = sum(len(texts[h]) for h in set(pair) - seen)
+            if batch and (len(batch) == self.pairs_per_request or chars + added > self.max_prompt_chars):
+                batches.append(batch)
+                batch, seen, chars = [], set(), 0
+                added = sum(len(texts[h]) for h in set(pair))
+            batch.append(pair)
+            seen.update(pair)
+            chars += added
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def classify_many(self, pairs: list[tuple[str, str]], deadline: float) -> list[Dict[str, Any] | None]:
+        """
+        Results in the order of pairs. A pair that failed or did not finish
+        within deadline seconds gets None.
+        """
+        results = [None] * len(pairs)
+        async for position, result in self.classify_iter(pairs, deadline):
+            results[position] = result
+        return results
+
+    async def classify_iter(self, pairs: list[tuple[str, str]], deadline: float, report: dict | None = None):
+        """
+        (position, verdict) for the pairs as verdicts come in, cached ones
+        first, then one request at a time. Pairs that failed or did not finish
+        within deadline seconds are not yielded, report, when given, gets the
+        number of the latter as "timed_out".
+        """
+        if report is not None:
+            report["timed_out"] = 0
+        if not pairs:
+            return
+
+        # Canonical pair: its two paragraph hashes in sorted order
+        texts = {}
+        positions = {}
+        for position, (a, b) in enumerate(pairs):
+            ha, hb = text_hash(a), text_hash(b)
+            texts.setdefault(ha, a)
+            texts.setdefault(hb, b)
+            pair, swapped = ((hb, ha), True) if hb < ha else ((ha, hb), False)
+            positions.setdefault(pair, []).append((position, swapped))
+
+        usage = _new_usage()
+        yielded = 0
+        todo = []
+        # Every lookup in one go on a worker thread, sqlite would block the event loop
+        cached = await asyncio.to_thread(self._cached_many, [(texts[a], texts[b]) for a, b in positions])
+        for pair, (hit, result) in zip(positions, cached):
+            if not hit:
+                todo.append(pair)
+            elif result is not None:
+                for position, swapped in positions[pair]:
+                    yielded += 1
+                    yield position, swap_sides(result) if swapped else result
+
+        batches = {
+            asyncio.create_task(self._classify_batch(batch, texts, usage)): batch
+            for batch in self._plan(todo, texts)
+        }
+        pending = set(batches)
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, end - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is not None:
+                        logger.warning(f"Contradiction classification failed: {task.exception()!r}")
+                        continue
+                    for pair, result in task.result().items():
+                        if result is None:
+                            continue
+                        for position, swapped in positions[pair]:
+                            yielded += 1
+                            yield position, swap_sides(result) if swapped else result
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                # Let cancelled calls unwind and give back their semaphore slots
+                await asyncio.gather(*pending, return_exceptions=True)
+
+            self.usage["pairs"] += len(pairs)
+            self.usage["unique_pairs"] += len(positions)
+            logger.info(
+                f"Classified {len(pairs)} pairs as {len(positions)} unique, "
+                f"{len(todo)} not cached, in {usage['requests']} requests "
+                f"({usage['prompt_tokens']} prompt tokens), {len(pairs) - yielded} without a verdict"
+            )
+            if pending:
+                timed_out = sum(len(batches[t]) for t in pending)
+                logger.warning(f"{timed_out} pairs timed out after {deadline}s")
+                if report is not None:
+                    report["timed_out"] = timed_out
+
+    def stats(self) -> dict:
+        return {"model": self.model, "offline": self.offline, **self.usage}
+
+
+def _new_usage() -> dict:
+    return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        # Exponential backoff with full jitter, capped at 30s
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+
+def within_budget(pairs: list[tuple[str, str]], order, budget: int) -> list[int]:
+    """
+    Positions of pairs taken in order until budget distinct pairs are kept, in
+    input order. Copies of a kept pair, either way round, come along for free,
+    classify_iter asks for one verdict per distinct pair.
+    """
+    kept = set()
+    selected = []
+    for position in order:
+        a, b = pairs[position]
+        pair = frozenset((text_hash(a), text_hash(b)))
+        if pair not in kept:
+            if len(kept) == budget:
+                continue
+            kept.add(pair)
+        selected.append(position)
+    return sorted(selected)
+
+
 def rank_score(result: dict, edge_type: str, sim_score: Optional[float]) -> float:
     base = float(result.get("confidence", 0.0))
     t = str(result.get("type", "other")).lower()
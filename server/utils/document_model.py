@@ -0,0 +1,134 @@
+import numpy as np
+
+from schemas.document import Paragraph
+
+BBOX_COLUMNS = ["x0", "y0", "x1", "y1"]
+
+
+class DocumentModel:
+    """
+    The paragraphs of one document as columns: ids and texts as lists, pages,
+    paragraph numbers and relation counts as integer arrays, and the boxes as
+    one (n, 4) array. Rows are found by id through a dict built once.
+
+    Built straight from the parse frame or from the nodes of a stored graph,
+    and shared by the relation builder, the contradiction stage and the API.
+    Texts and boxes are handed out as they are held, never copied; node dicts
+    and Paragraph models are only built where a response needs them.
+    """
+    __slots__ = ("document_id", "ids", "texts", "pages", "paragraph_enums", "bboxes", "relations", "rows")
+
+    def __init__(
+        self,
+        document_id: str,
+        ids: list[str],
+        texts: list[str],
+        pages: np.ndarray,
+        paragraph_enums: np.ndarray,
+        bboxes: np.ndarray,
+        relations: np.ndarray | None = None,
+    ):
+        self.document_id = document_id
+        self.ids = ids
+        self.texts = texts
+        self.pages = pages
+        self.paragraph_enums = paragraph_enums
+        self.bboxes = bboxes
+        self.relations = relations if relations is not None else np.zeros(len(ids), dtype=np.int64)
+        self.rows = {node_id: row for row, node_id in enumerate(ids)}
+
+    @classmethod
+    def from_dataframe(cls, df_paragraphs, document_id: str, id_prefix: str = "") -> "DocumentModel":
+        """
+        Model of PDF_to_dataframe's paragraph frame, ids are id_prefix and the
+        frame index.
+        """
+        text_column = "clean_text" if "clean_text" in df_paragraphs.columns else "text"
+        return cls(
+            document_id,
+            [f"{id_prefix}{index}" for index in df_paragraphs.index],
+            df_paragraphs[text_column].tolist(),
+            df_paragraphs["page"].to_numpy(dtype=np.int64),
+            df_paragraphs["paragraph_enum"].to_numpy(dtype=np.int64),
+            df_paragraphs[BBOX_COLUMNS].to_numpy(dtype=np.float64),
+        )
+
+    @classmethod
+    def from_nodes(cls, nodes: list[dict], document_id: str | None = None) -> "DocumentModel":
+        """
+        Model of the node dicts of a stored graph.
+        """
+        if document_id is None:
+            document_id = nodes[0]["documentId"] if nodes else ""
+        return cls(
+            document_id,
+            [n["id"] for n in nodes],
+            [n["text"] for n in nodes],
+            np.fromiter((n["page"] for n in nodes), dtype=np.int64, count=len(nodes)),
+            np.fromiter((n["paragraph_enum"] for n in nodes), dtype=np.int64, count=len(nodes)),
+            np.array([n["bbox"] for n in nodes], dtype=np.float64).reshape(len(nodes), 4),
+            np.fromiter((n.get("relationsCount", 0) for n in nodes), dtype=np.int64, count=len(nodes)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, node_id: str) -> int | None:
+        return self.rows.get(node_id)
+
+    def text(self, node_id: str) -> str:
+        """
+        Text of the node, empty for ids not in the document.
+        """
+        row = self.rows.get(node_id)
+        return self.texts[row] if row is not None else ""
+
+    def page(self, node_id: str) -> int:
+        return int(self.pages[self.rows[node_id]])
+
+    def bbox(self, node_id: str) -> np.ndarray:
+        # A view into the box column
+        return self.bboxes[self.rows[node_id]]
+
+    def count_relations(self, edges: list[dict]):
+        """
+        relationsCount of every node, from the edges it is an end of.
+        """
+        ends = [self.rows[e["source"]] for e in edges] + [self.rows[e["target"]] for e in edges]
+        self.relations = np.bincount(np.asarray(ends, dtype=np.int64), minlength=len(self.ids))
+
+    def node(self, row: int) -> dict:
+        return {
+            "id": self.ids[row],
+            "documentId": self.document_id,
+            "page": int(self.pages[row]),
+            "paragraph_enum": int(self.paragraph_enums[row]),
+            "text": self.texts[row],
+            "bbox": self.bboxes[row].tolist(),
+            "relationsCount": int(self.relations[row]),
+        }
+
+    def to_nodes(self) -> list[dict]:
+        """
+        Every row as a node dict, in the shape of Paragraph.model_dump().
+        """
+        pages = self.pages.tolist()
+        enums = self.paragraph_enums.tolist()
+        bboxes = self.bboxes.tolist()
+        relations = self.relations.tolist()
+        return [
+            {
+                "id": node_id,
+                "documentId": self.document_id,
+                "page": page,
+                "paragraph_enum": paragraph_enum,
+                "text": text,
+                "bbox": bbox,
+                "relationsCount": count,
+            }
+            for node_id, text, page, paragraph_enum, bbox, count
+            in zip(self.ids, self.texts, pages, enums, bboxes, relations)
+        ]
+
+    def to_paragraphs(self) -> list[Paragraph]:
+        return [Paragraph(**node) for node in self.to_nodes()]
@@ -1,8 +1,10 @@
 from pathlib import Path
 from schemas.document import DatasetDocument
 from utils.config import Config
+from utils.upload_store import UploadStore, UploadWriter
 from utils.utils import iter_pdfs
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,11 @@ class DocumentStore:
             cls._instance = super(DocumentStore, cls).__new__(cls)
             cls._instance._documents = []
             cls._instance._path_map = {}
+            cls._instance._doc_map = {}
+            # Set by set_graph_store, graphs are keyed by the pipeline that builds them
+            cls._instance._graph_store = None
+            cls._instance._upload_store = UploadStore(Config.UPLOAD_DIR, Config.UPLOAD_MAX_BYTES)
+            cls._instance._lock = threading.Lock()
             cls._instance._initialized = False
         return cls._instance
 
@@ -22,30 +29,99 @@ class DocumentStore:
             return
 
         logger.info("Initializing DocumentStore...")
-        if not Config.CUAD_PDF_DIR.exists():
-            logger.error(f"Dataset directory not found: {Config.CUAD_PDF_DIR}")
-            return
-
         documents = []
         path_map = {}
 
-        for pdf_path in iter_pdfs(Config.CUAD_PDF_DIR):
-            doc = DatasetDocument(
-                id=pdf_path.stem,
-                name=pdf_path.name,
-                origin="dataset",
-                processed=False
-            )
+        if Config.CUAD_PDF_DIR.exists():
+            for pdf_path in iter_pdfs(Config.CUAD_PDF_DIR):
+                doc = DatasetDocument(
+                    id=pdf_path.stem,
+                    name=pdf_path.name,
+                    origin="dataset",
+                    processed=self._has_graph(pdf_path.stem)
+                )
+                documents.append(doc)
+                path_map[pdf_path.stem] = pdf_path
+        else:
+            logger.error(f"Dataset directory not found: {Config.CUAD_PDF_DIR}")
+
+        for sha256, name, pdf_path in self._upload_store.entries():
+            doc = self._upload_document(sha256, name)
             documents.append(doc)
-            path_map[pdf_path.stem] = pdf_path
+            path_map[doc.id] = pdf_path
 
         self._documents = documents
         self._path_map = path_map
+        self._doc_map = {doc.id: doc for doc in documents}
         self._initialized = True
-        logger.info(f"DocumentStore initialized with {len(documents)} documents.")
+        processed = sum(doc.processed for doc in documents)
+        uploads = sum(doc.origin == "upload" for doc in documents)
+        logger.info(f"DocumentStore initialized with {len(documents)} documents ({uploads} uploads, {processed} processed).")
+
+    def _upload_document(self, sha256: str, name: str) -> DatasetDocument:
+        doc_id = f"upload_{sha256[:16]}"
+        return DatasetDocument(
+            id=doc_id,
+            name=name,
+            origin="upload",
+            processed=self._has_graph(doc_id)
+        )
+
+    def check_upload_length(self, length: int):
+        self._upload_store.check_length(length)
+
+    def open_upload(self, filename: str) -> UploadWriter:
+        """
+        Writer for an upload being received, see add_upload.
+        """
+        return self._upload_store.open(filename)
+
+    def add_upload(self, upload: UploadWriter) -> tuple[DatasetDocument, str]:
+        """
+        Stores a received upload and registers it, or resolves it to the
+        document already registered for the same content. Returns the
+        document and the PDF's SHA-256.
+        """
+        sha256, pdf_path = upload.commit()
+        doc = self._upload_document(sha256, upload.filename)
+
+        with self._lock:
+            if doc.id in self._doc_map:
+                return self._doc_map[doc.id], sha256
+            self._documents.append(doc)
+            self._path_map[doc.id] = pdf_path
+            self._doc_map[doc.id] = doc
+        return doc, sha256
+
+    def upload_stats(self) -> dict:
+        return self._upload_store.stats()
 
     def get_documents(self) -> list[DatasetDocument]:
         return self._documents
 
     def get_path(self, doc_id: str) -> Path | None:
-        return self._path_map.get(doc_id)
\ No newline at end of file
+        return self._path_map.get(doc_id)
+
+    def set_graph_store(self, graph_store):
+        """
+        The ResultStore keeping graphs, keyed by graph_fingerprint.
+        """
+        self._graph_store = graph_store
+
+    def _has_graph(self, doc_id: str) -> bool:
+        return self._graph_store is not None and self._graph_store.has(doc_id)
+
+    def get_graph_meta(self, doc_id: str, pdf_sha256: str | None = None) -> dict | None:
+        if self._graph_store is None:
+            return None
+        return self._graph_store.get_meta(doc_id, pdf_sha256)
+
+    def get_graph(self, doc_id: str, pdf_sha256: str | None = None) -> dict | None:
+        if self.get_graph_meta(doc_id, pdf_sha256) is None:
+            return None
+        return self._graph_store.load(doc_id)
+
+    def save_graph(self, doc_id: str, graph: dict, pdf_sha256: str):
+        self._graph_store.save(doc_id, pdf_sha256, graph)
+        if doc_id in self._doc_map:
+            self._doc_map[doc_id].processed = True
@@ -0,0 +1,212 @@
+import fcntl
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.tsv"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Paragraph embeddings keyed by (model name, hash of the normalized text).
+
+    Recent vectors are kept in an in-memory LRU. Every vector is also appended
+    to a float32 matrix on disk, read through a memory map, with an index file
+    mapping text hashes to rows. Both files are append-only and writes are
+    serialized with a file lock, so several processes can share a cache
+    directory. Only misses are sent to the model, in a single encode call
+    made outside both locks.
+    """
+
+    def __init__(self, cache_dir: Path, model_name: str, memory_items: int = 50_000):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_")[-48:]
+        digest = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:8]
+        self.cache_dir = Path(cache_dir) / f"{slug}-{digest}"
+        self.model_name = model_name
+        self.memory_items = memory_items
+
+        self.dim = None
+        self._rows = {}
+        self._index_offset = 0
+        self._vectors = None
+        self._memory = OrderedDict()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list[str], model, batch_size: int = 32) -> np.ndarray:
+        keys = [text_key(t) for t in texts]
+
+        with self._lock:
+            self._load_meta()
+            found = self._lookup(keys)
+
+            missing = {}
+            for i, key in enumerate(keys):
+                if key not in found and key not in missing:
+                    missing[key] = normalize_text(texts[i])
+
+            if missing:
+                # Another process may have stored them since the index was last read
+                self._refresh_index()
+                found.update(self._lookup_disk(missing))
+                missing = {k: t for k, t in missing.items() if k not in found}
+
+        if missing:
+            # Outside the locks, other lookups go on while the model runs
+            vectors = model.encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ).astype(np.float32, copy=False)
+            with self._lock:
+                self._append(list(missing), vectors)
+                for key, vector in zip(missing, vectors):
+                    found[key] = vector
+                    self._remember(key, vector)
+                self.misses += len(missing)
+
+        if not keys:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def _lookup(self, keys):
+        found = {}
+        for key in keys:
+            if key in found:
+                continue
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                found[key] = vector
+                self.memory_hits += 1
+        found.update(self._lookup_disk([k for k in dict.fromkeys(keys) if k not in found]))
+        return found
+
+    def _lookup_disk(self, keys):
+        found = {}
+        for key in keys:
+            row = self._rows.get(key)
+            if row is None:
+                continue
+            vector = np.array(self._matrix(row)[row])
+            found[key] = vector
+            self._remember(key, vector)
+            self.disk_hits += 1
+        return found
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _matrix(self, row):
+        # The memory map has a fixed length, reopen it once the file has grown past it
+        if self._vectors is None or row >= len(self._vectors):
+            path = self.cache_dir / VECTORS_FILE
+            rows = path.stat().st_size // (4 * self.dim)
+            self._vectors = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._vectors
+
+    def _load_meta(self):
+        if self.dim is not None:
+            return
+        try:
+            meta = json.loads((self.cache_dir / META_FILE).read_text())
+        except FileNotFoundError:
+            return
+        self.dim = meta["dim"]
+        self._refresh_index()
+
+    def _refresh_index(self):
+        if self.dim is None:
+            return
+        try:
+            with open(self.cache_dir / INDEX_FILE, "rb") as f:
+                f.seek(self._index_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # A writer may be half way through a line, stop at the last complete one
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").splitlines():
+            key, row = line.split("\t")
+            self._rows[key] = int(row)
+        self._index_offset += end
+
+    def _append(self, keys, vectors):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.cache_dir / LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            meta_path = self.cache_dir / META_FILE
+            if not meta_path.exists():
+                meta_path.write_text(json.dumps({"model": self.model_name, "dim": int(vectors.shape[1])}))
+            self._load_meta()
+            if vectors.shape[1] != self.dim:
+                logger.error(f"Embedding cache {self.cache_dir} holds {self.dim}-d vectors, got {vectors.shape[1]}-d")
+                return
+
+            # Another thread or process may have stored some of them while they were encoded
+            self._refresh_index()
+            new = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not new:
+                return
+            keys = [keys[i] for i in new]
+            vectors = vectors[new]
+
+            # Vectors go first, an index line never points past the end of the matrix
+            with open(self.cache_dir / VECTORS_FILE, "ab") as f:
+                first_row = f.tell() // (4 * self.dim)
+                f.seek(first_row * 4 * self.dim)
+                f.truncate()
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+            with open(self.cache_dir / INDEX_FILE, "ab+") as f:
+                # Drop a line left half written by a writer that died
+                size = f.seek(0, 2)
+                tail_start = max(0, size - 128)
+                f.seek(tail_start)
+                tail = f.read()
+                if tail and not tail.endswith(b"\n"):
+                    f.truncate(tail_start + tail.rfind(b"\n") + 1)
+                f.write("".join(f"{key}\t{first_row + i}\n" for i, key in enumerate(keys)).encode("utf-8"))
+
+            self._refresh_index()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+            "disk_items": len(self._rows),
+        }
@@ -0,0 +1,260 @@
+"""
+Wire formats of /process graphs.
+
+JSON goes through orjson when it is installed. Two compact formats hold the
+same graph as columns, one list per node and edge field, with edge ends
+given as node rows instead of ids:
+
+- application/x-msgpack, when msgpack is installed
+- application/vnd.apache.arrow.stream, one record batch with a single row
+  whose nodes, edges and contradictions columns are lists of structs
+
+Bodies are compressed with brotli, when it is installed, or gzip, whichever
+the client accepts first.
+
+orjson, msgpack and brotli are in requirements.txt. Each is still imported
+optionally, without one the server falls back to json, leaves msgpack out
+of negotiation or offers gzip only.
+"""
+import gzip
+import json
+
+import pyarrow as pa
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+NODE_FIELDS = ["id", "documentId", "page", "paragraph_enum", "text", "bbox", "relationsCount"]
+EDGE_FIELDS = ["source", "target", "type", "score", "ref_label", "ref_value"]
+CONTRADICTION_FIELDS = [
+    "source", "target", "type", "confidence", "edge_type", "edge_score",
+    "evidence_a", "evidence_b", "evidence_a_bbox", "evidence_b_bbox",
+    "evidence_a_page", "evidence_b_page", "summary", "score",
+]
+
+BBOX = pa.list_(pa.float64())
+ARROW_FIELDS = {
+    "nodes": [
+        pa.field("id", pa.string()),
+        pa.field("documentId", pa.string()),
+        pa.field("page", pa.int32()),
+        pa.field("paragraph_enum", pa.int32()),
+        pa.field("text", pa.string()),
+        pa.field("bbox", BBOX),
+        pa.field("relationsCount", pa.int32()),
+    ],
+    "edges": [
+        pa.field("source", pa.int32()),
+        pa.field("target", pa.int32()),
+        pa.field("type", pa.string()),
+        pa.field("score", pa.float64()),
+        pa.field("ref_label", pa.string()),
+        pa.field("ref_value", pa.string()),
+    ],
+    "contradictions": [
+        pa.field("source", pa.string()),
+        pa.field("target", pa.string()),
+        pa.field("type", pa.string()),
+        pa.field("confidence", pa.float64()),
+        pa.field("edge_type", pa.string()),
+        pa.field("edge_score", pa.float64()),
+        pa.field("evidence_a", pa.string()),
+        pa.field("evidence_b", pa.string()),
+        pa.field("evidence_a_bbox", BBOX),
+        pa.field("evidence_b_bbox", BBOX),
+        pa.field("evidence_a_page", pa.int32()),
+        pa.field("evidence_b_page", pa.int32()),
+        pa.field("summary", pa.string()),
+        pa.field("score", pa.float64()),
+    ],
+}
+
+
+def complete_edges(edges: list[dict]) -> list[dict]:
+    """
+    edges with every Edge field, in Edge's order, so they serialize like
+    Edge.model_dump() without being validated again. Graphs stored before
+    the edges carried every field get the missing ones as None.
+    """
+    if all(len(e) == len(EDGE_FIELDS) for e in edges):
+        return edges
+    defaults = dict.fromkeys(EDGE_FIELDS)
+    return [e if len(e) == len(EDGE_FIELDS) else {**defaults, **e} for e in edges]
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def loads(body: bytes):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def media_types() -> list[str]:
+    return [JSON, ARROW] + ([MSGPACK] if msgpack is not None else [])
+
+
+def _qualities(header: str) -> list[tuple[str, float, int]]:
+    # Values of an Accept style header with their q and position, q=0 kept
+    parsed = []
+    for position, item in enumerate(header.split(",")):
+        value, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.lower().startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if value:
+            parsed.append((value.lower(), q, position))
+    return parsed
+
+
+def _preferences(header: str) -> list[tuple[str, float]]:
+    # Values of an Accept style header and their q, best first, q=0 dropped
+    ranked = sorted((-q, position, value) for value, q, position in _qualities(header) if q > 0)
+    return [(value, -q) for q, _, value in ranked]
+
+
+def negotiate(accept: str | None) -> str:
+    """
+    Media type to answer with, JSON unless the client prefers a compact one.
+    """
+    available = media_types()
+    for value, _ in _preferences(accept or ""):
+        if value in available:
+            return value
+        if value in ("*/*", "application/*"):
+            return JSON
+    return JSON
+
+
+def content_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Compression to apply, None when the client takes none we have. A coding
+    the header names gets its own q, q=0 refusing it, and * only stands for
+    the ones it does not name. Brotli wins ties, browsers list it after gzip.
+    """
+    named = {}
+    for value, q, _ in _qualities(accept_encoding or ""):
+        named.setdefault(value, q)
+    wildcard = named.get("*", 0.0)
+
+    options = []
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        q = named.get(coding, wildcard)
+        if q > 0:
+            options.append((q, coding))
+    if not options:
+        return None
+    return max(options, key=lambda option: (option[0], option[1] == "br"))[1]
+
+
+def compress(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def to_columns(graph: dict) -> dict:
+    """
+    The graph as one list per field, edge ends as node rows.
+    """
+    nodes = graph["nodes"]
+    rows = {node["id"]: row for row, node in enumerate(nodes)}
+    edges = graph["edges"]
+    contradictions = graph.get("contradictions", [])
+    return {
+        "nodes": {field: [node[field] for node in nodes] for field in NODE_FIELDS},
+        "edges": {
+            "source": [rows[e["source"]] for e in edges],
+            "target": [rows[e["target"]] for e in edges],
+            **{field: [e.get(field) for e in edges] for field in EDGE_FIELDS[2:]},
+        },
+        "contradictions": {field: [c.get(field) for c in contradictions] for field in CONTRADICTION_FIELDS},
+    }
+
+
+def from_columns(columns: dict) -> dict:
+    """
+    The graph dict back from to_columns' layout.
+    """
+    def records(table: dict, fields: list[str]) -> list[dict]:
+        return [dict(zip(fields, values)) for values in zip(*(table[field] for field in fields))]
+
+    nodes = records(columns["nodes"], NODE_FIELDS)
+    ids = columns["nodes"]["id"]
+    edges = records(columns["edges"], EDGE_FIELDS)
+    for e in edges:
+        e["source"] = ids[e["source"]]
+        e["target"] = ids[e["target"]]
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "contradictions": records(columns["contradictions"], CONTRADICTION_FIELDS),
+    }
+
+
+def _arrow_batch(columns: dict) -> pa.RecordBatch:
+    arrays = []
+    for part, fields in ARROW_FIELDS.items():
+        table = columns[part]
+        length = len(table[fields[0].name])
+        values = pa.StructArray.from_arrays(
+            [pa.array(table[field.name], type=field.type) for field in fields],
+            fields=fields,
+        )
+        arrays.append(pa.ListArray.from_arrays(pa.array([0, length], type=pa.int32()), values))
+    return pa.RecordBatch.from_arrays(arrays, names=list(ARROW_FIELDS))
+
+
+def encode(graph: dict, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(to_columns(graph), use_bin_type=True)
+    if media_type == ARROW:
+        batch = _arrow_batch(to_columns(graph))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+    return dumps(graph)
+
+
+def decode(body: bytes, media_type: str = JSON) -> dict:
+    if media_type == MSGPACK:
+        return from_columns(msgpack.unpackb(body, raw=False))
+    if media_type == ARROW:
+        batch = pa.ipc.open_stream(body).read_next_batch()
+        columns = {
+            part: batch.column(part).values.flatten()
+            for part in ARROW_FIELDS
+        }
+        return from_columns({
+            part: {field.name: array.to_pylist() for field, array in zip(ARROW_FIELDS[part], columns[part])}
+            for part in ARROW_FIELDS
+        })
+    return loads(body)
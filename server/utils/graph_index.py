@@ -0,0 +1,218 @@
+import base64
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.graph_codec import complete_edges
+
+# Deepest neighborhood a query may ask for
+MAX_HOPS = 3
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _positions(values) -> dict:
+    # value -> ascending positions holding it, None values left out
+    index = {}
+    for position, value in enumerate(values):
+        if value is not None:
+            index.setdefault(value, []).append(position)
+    return {value: np.array(positions, dtype=np.int64) for value, positions in index.items()}
+
+
+class GraphIndex:
+    """
+    Lookups over one stored graph, built once and shared by every query of it.
+
+    Edges are held as columns, ends as node rows and scores as floats with
+    NaN for none, with the positions of every type and ref_label. Both
+    directions of every edge go in a CSR adjacency, the edges around a node
+    are one slice of it. Nodes are also kept ordered by relationsCount.
+
+    Results come in stored order, which never changes for a given version
+    of the graph, so a cursor is simply the position to resume from.
+    """
+
+    def __init__(self, graph: dict, version: str):
+        self.version = version
+        self.nodes = graph["nodes"]
+        self.edges = complete_edges(graph["edges"])
+        self.rows = {node["id"]: row for row, node in enumerate(self.nodes)}
+
+        n, m = len(self.nodes), len(self.edges)
+        self.node_rows = np.arange(n)
+        self.sources = np.fromiter((self.rows[e["source"]] for e in self.edges), dtype=np.int64, count=m)
+        self.targets = np.fromiter((self.rows[e["target"]] for e in self.edges), dtype=np.int64, count=m)
+        self.scores = np.fromiter(
+            (np.nan if e["score"] is None else e["score"] for e in self.edges), dtype=np.float64, count=m
+        )
+        self.by_type = _positions(e["type"] for e in self.edges)
+        self.by_ref_label = _positions(e["ref_label"] for e in self.edges)
+
+        ends = np.concatenate([self.sources, self.targets])
+        order = np.argsort(ends, kind="stable")
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(ends, minlength=n))])
+        self.neighbors = np.concatenate([self.targets, self.sources])[order]
+        self.incident = np.concatenate([np.arange(m), np.arange(m)])[order]
+
+        relations = np.fromiter((node.get("relationsCount", 0) for node in self.nodes), dtype=np.int64, count=n)
+        self.by_relations = np.argsort(-relations, kind="stable")
+
+    def edge_positions(
+        self,
+        types: list[str] | None = None,
+        min_score: float | None = None,
+        max_score: float | None = None,
+        ref_label: str | None = None,
+    ) -> np.ndarray:
+        """
+        Ascending positions of the edges matching every filter given. Edges
+        without a score never match a score bound.
+        """
+        if types:
+            found = [self.by_type[t] for t in set(types) if t in self.by_type]
+            if len(found) == 1:
+                positions = found[0]
+            else:
+                positions = np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+        else:
+            positions = np.arange(len(self.edges))
+
+        if ref_label is not None:
+            positions = np.intersect1d(positions, self.by_ref_label.get(ref_label, np.empty(0, dtype=np.int64)), assume_unique=True)
+
+        if min_score is not None or max_score is not None:
+            scores = self.scores[positions]
+            keep = ~np.isnan(scores)
+            if min_score is not None:
+                keep &= scores >= min_score
+            if max_score is not None:
+                keep &= scores <= max_score
+            positions = positions[keep]
+        return positions
+
+    def page(self, positions: np.ndarray, cursor: str | None, limit: int) -> tuple[np.ndarray, str | None]:
+        """
+        Up to limit of positions from the cursor on, and the cursor of the
+        page after, None on the last one.
+        """
+        start = np.searchsorted(positions, self._resume(cursor)) if cursor else 0
+        selected = positions[start:start + limit]
+        if start + limit < len(positions):
+            return selected, self._cursor(int(positions[start + limit]))
+        return selected, None
+
+    def _cursor(self, position: int) -> str:
+        return base64.urlsafe_b64encode(f"{self.version}:{position}".encode("utf-8")).decode("ascii")
+
+    def _resume(self, cursor: str) -> int:
+        try:
+            version, position = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit(":", 1)
+            position = int(position)
+        except ValueError:
+            raise InvalidCursor("Malformed cursor")
+        if version != self.version:
+            raise InvalidCursor("The graph changed since this cursor was issued, start over")
+        return position
+
+    def top(self, n: int) -> list[dict]:
+        return [self.nodes[row] for row in self.by_relations[:n]]
+
+    def neighborhood(
+        self,
+        node_id: str,
+        k: int,
+        types: list[str] | None = None,
+        limit: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+        """
+        Rows of the nodes at most k hops from node_id and their hop counts,
+        nearest first, then the positions of the edges between them. With
+        types only those edges are walked and returned. Past limit nodes the
+        farthest are dropped and the last flag is set.
+        """
+        allowed = None
+        if types:
+            allowed = np.zeros(len(self.edges), dtype=bool)
+            allowed[self.edge_positions(types)] = True
+
+        hops = np.full(len(self.nodes), -1, dtype=np.int64)
+        frontier = np.array([self.rows[node_id]], dtype=np.int64)
+        hops[frontier] = 0
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            slices = [slice(self.indptr[row], self.indptr[row + 1]) for row in frontier]
+            reached = np.concatenate([self.neighbors[s] for s in slices])
+            if allowed is not None:
+                reached = reached[allowed[np.concatenate([self.incident[s] for s in slices])]]
+            frontier = np.unique(reached[hops[reached] == -1])
+            hops[frontier] = hop
+
+        rows = np.flatnonzero(hops >= 0)
+        rows = rows[np.argsort(hops[rows], kind="stable")]
+        truncated = limit is not None and len(rows) > limit
+        if truncated:
+            rows = rows[:limit]
+
+        # Edges between the nodes kept, from their slices of the adjacency
+        inside = np.zeros(len(self.nodes), dtype=bool)
+        inside[rows] = True
+        slices = [slice(self.indptr[row], self.indptr[row + 1]) for row in rows]
+        incident = np.concatenate([self.incident[s] for s in slices])
+        incident = incident[inside[np.concatenate([self.neighbors[s] for s in slices])]]
+        if allowed is not None:
+            incident = incident[allowed[incident]]
+        return rows, hops[rows], np.unique(incident), truncated
+
+
+class GraphIndexCache:
+    """
+    GraphIndex of the most recently queried graphs, at most max_items. An
+    index is keyed by document and ETag of the stored result, so a new
+    result is indexed again and the old index ages out.
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, document_id: str, etag: str, load) -> GraphIndex | None:
+        """
+        The index of the graph, built from load() on a miss. None when load
+        finds no graph.
+        """
+        key = (document_id, etag)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            self.misses += 1
+
+        graph = load()
+        if graph is None:
+            return None
+        index = GraphIndex(graph, version=etag.strip('"')[:16])
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_items:
+                self._indexes.popitem(last=False)
+        return index
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._indexes),
+            "max_items": self.max_items,
+        }
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Stage a job enters with each pipeline event
+STAGES = {"nodes": "graph", "edges": "contradictions", "summary": "done"}
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Processing queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobManager:
+    """
+    Runs DocumentPipeline jobs in the background, at most `concurrency` at a
+    time, with at most `queue_size` more waiting. Blocking pipeline steps run
+    on the pipeline's own thread pool, so the event loop stays free for
+    lightweight requests while documents are processed.
+
+    Every pipeline event is kept on the job, which gives its stage and
+    progress for GET /jobs/{id}, lets /process/stream follow it, and holds
+    the graph once done. Finished jobs are forgotten after ttl_seconds.
+
+    Submitting a document that is already queued or running, same id, PDF
+    hash and pipeline fingerprint, returns the job in flight instead of
+    starting another one, so concurrent callers share one computation.
+    """
+
+    def __init__(self, pipeline, concurrency: int, queue_size: int, ttl_seconds: float):
+        self.pipeline = pipeline
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.ttl_seconds = ttl_seconds
+
+        self.jobs = {}
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.completed = 0
+        self.coalesced = 0
+        # Moving average of job durations, for Retry-After
+        self.average_seconds = None
+
+        self._queue = None
+        self._workers = []
+        # Single-flight key -> id of the job computing it
+        self._inflight = {}
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def running(self) -> int:
+        return sum(job["status"] == "running" for job in self.jobs.values())
+
+    def submit(
+        self,
+        pdf_path: str,
+        document_id: str,
+        pdf_sha256: str | None = None,
+    ) -> dict:
+        """
+        Queue a document and return its job, or the job already computing it.
+        Raises QueueFull when queue_size jobs are already waiting.
+        """
+        self._expire()
+        key = (document_id, pdf_sha256, self.pipeline.result_store.fingerprint) if pdf_sha256 else None
+        job = self.jobs.get(self._inflight.get(key))
+        if job is not None:
+            job["coalesced"] += 1
+            self.coalesced += 1
+            return job
+
+        if self.queued() >= self.queue_size:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "document_id": document_id,
+            "status": "queued",
+            "stage": "queued",
+            "progress": {"nodes": 0, "edges": 0, "contradictions": 0},
+            "timings": {},
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+            "result": None,
+            "coalesced": 0,
+            # Not part of the API
+            "_args": (pdf_path, document_id, pdf_sha256),
+            "_key": key,
+            "_events": [],
+            "_changed": asyncio.Event(),
+        }
+        self.jobs[job["id"]] = job
+        if key is not None:
+            self._inflight[key] = job["id"]
+        self._queue.put_nowait(job["id"])
+        self.submitted += 1
+        return job
+
+    def retry_after(self) -> int:
+        # Time for the jobs ahead to drain, one average job if nothing finished yet
+        per_job = self.average_seconds or 30.0
+        ahead = self.queued() + self.running()
+        return max(1, math.ceil(per_job * ahead / self.concurrency))
+
+    def get(self, job_id: str) -> dict | None:
+        return self.jobs.get(job_id)
+
+    async def events(self, job_id: str):
+        """
+        Every event of the job, the past ones first, until it is over.
+        """
+        job = self.jobs[job_id]
+        position = 0
+        while True:
+            changed = job["_changed"]
+            while position < len(job["_events"]):
+                yield job["_events"][position]
+                position += 1
+            if job["status"] in ("done", "failed"):
+                return
+            await changed.wait()
+
+    async def wait(self, job_id: str) -> dict:
+        async for _ in self.events(job_id):
+            pass
+        return self.jobs[job_id]
+
+    def _push(self, job: dict, event: dict):
+        job["_events"].append(event)
+        # Wake the followers, later ones wait on a fresh event
+        changed, job["_changed"] = job["_changed"], asyncio.Event()
+        changed.set()
+
+    async def _worker(self):
+        while True:
+            job = self.jobs.get(await self._queue.get())
+            if job is not None:
+                await self._run(job)
+
+    async def _run(self, job: dict):
+        pdf_path, document_id, pdf_sha256 = job["_args"]
+        job["status"] = "running"
+        job["stage"] = "parse"
+        job["started"] = time.time()
+        graph = {}
+        try:
+            async for event in self.pipeline.events(pdf_path, document_id, pdf_sha256):
+                kind = event["event"]
+                job["stage"] = STAGES.get(kind, job["stage"])
+                if kind in ("nodes", "edges"):
+                    graph[kind] = event[kind]
+                    job["progress"][kind] = len(event[kind])
+                    if kind == "edges":
+                        # Copies with the counts, the nodes event stays as it was sent
+                        graph["nodes"] = [
+                            {**node, "relationsCount": count}
+                            for node, count in zip(graph["nodes"], event["relationsCount"])
+                        ]
+                elif kind == "contradiction":
+                    job["progress"]["contradictions"] += 1
+                elif kind == "summary":
+                    graph["contradictions"] = event["contradictions"]
+                    job["timings"] = event["timings"]
+                self._push(job, event)
+
+            job["result"] = graph
+            job["status"] = "done"
+            self.completed += 1
+        except Exception as e:
+            logger.exception(f"Processing job {job['id']} for {document_id} failed")
+            job["error"] = str(e)
+            job["status"] = "failed"
+            self.failed += 1
+            self._push(job, {"event": "error", "detail": str(e)})
+        finally:
+            self._inflight.pop(job["_key"], None)
+            job["finished"] = time.time()
+            seconds = job["finished"] - job["started"]
+            self.average_seconds = seconds if self.average_seconds is None else 0.8 * self.average_seconds + 0.2 * seconds
+            job["_changed"].set()
+
+    def _expire(self):
+        now = time.time()
+        for job_id in [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished"] is not None and now - job["finished"] > self.ttl_seconds
+        ]:
+            del self.jobs[job_id]
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queued": self.queued() if self._queue is not None else 0,
+            "running": self.running(),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "average_seconds": self.average_seconds,
+        }
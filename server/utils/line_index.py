@@ -0,0 +1,110 @@
+import re
+
+import numpy as np
+from rapidfuzz import fuzz
+
+NOT_ALNUM = re.compile(r"[^a-zA-Z0-9]")
+
+# Fuzzy matches of an evidence snippet have to score above this
+MIN_FUZZY_SCORE = 90
+
+
+def clean_text(t: str) -> str:
+    return NOT_ALNUM.sub("", t).lower()
+
+
+def norm_text(t: str) -> str:
+    return " ".join(t.lower().split())
+
+
+class PageLines:
+    """
+    Lines of one page: boxes as an (n, 4) array, the cleaned texts joined in
+    reading order into one string, and where each line starts and ends in it.
+    """
+    __slots__ = ("boxes", "texts", "clean", "text", "starts", "ends", "_norm")
+
+    def __init__(self, boxes: np.ndarray, texts: list[str]):
+        self.boxes = boxes
+        self.texts = texts
+        self.clean = [clean_text(t) for t in texts]
+        self.text = "".join(self.clean)
+        lengths = np.fromiter((len(c) for c in self.clean), dtype=np.int64, count=len(self.clean))
+        self.ends = np.cumsum(lengths)
+        self.starts = self.ends - lengths
+        self._norm = None
+
+    @property
+    def norm(self) -> list[str]:
+        if self._norm is None:
+            self._norm = [norm_text(t) for t in self.texts]
+        return self._norm
+
+    def covering(self, start: int, end: int) -> np.ndarray:
+        """
+        Positions of the lines that overlap text[start:end].
+        """
+        return np.flatnonzero((self.starts < end) & (self.ends > start))
+
+    def union(self, rows) -> list[float] | None:
+        if len(rows) == 0:
+            return None
+        boxes = self.boxes[rows]
+        return [
+            float(boxes[:, 0].min()),
+            float(boxes[:, 1].min()),
+            float(boxes[:, 2].max()),
+            float(boxes[:, 3].max()),
+        ]
+
+
+class LineIndex:
+    """
+    Lines of a document by page, built once from PDF_to_dataframe's line
+    frame and shared by every evidence lookup of the document.
+
+    A snippet is cleaned the same way as the lines and looked up in the page
+    string, exactly first and then as the best fuzzy window, so one search
+    gives the lines it covers.
+    """
+
+    def __init__(self, df_lines):
+        self.pages = {}
+        if df_lines is None or df_lines.empty:
+            return
+
+        pages = df_lines["page"].to_numpy()
+        order = np.argsort(pages, kind="stable")
+        pages = pages[order]
+        boxes = df_lines[["x0", "y0", "x1", "y1"]].to_numpy(dtype=np.float64)[order]
+        texts = df_lines["text"].astype(str).to_numpy()[order]
+
+        bounds = np.flatnonzero(np.diff(pages)) + 1
+        for start, end in zip([0, *bounds], [*bounds, len(pages)]):
+            self.pages[int(pages[start])] = PageLines(boxes[start:end], texts[start:end].tolist())
+
+    def bbox(self, snippet: str, page: int) -> list[float] | None:
+        """
+        Box around the lines of page that hold snippet, None if it is not there.
+        """
+        lines = self.pages.get(page)
+        needle = clean_text(snippet)
+        if lines is None or not needle or not lines.text:
+            return None
+
+        position = lines.text.find(needle)
+        if position != -1:
+            return lines.union(lines.covering(position, position + len(needle)))
+
+        if len(needle) >= len(lines.text):
+            # Snippet longer than the page, it may still hold all of it
+            return lines.union(lines.covering(0, len(lines.text))) if lines.text in needle else None
+
+        alignment = fuzz.partial_ratio_alignment(needle, lines.text, score_cutoff=MIN_FUZZY_SCORE)
+        if alignment is not None and alignment.score > MIN_FUZZY_SCORE:
+            return lines.union(lines.covering(alignment.dest_start, alignment.dest_end))
+
+        # Last resort, lines holding at least two of the snippet's longer words
+        keywords = [clean_text(w) for w in snippet.split() if len(w) > 3]
+        rows = [i for i, line in enumerate(lines.clean) if sum(kw in line for kw in keywords) >= 2]
+        return lines.union(rows)
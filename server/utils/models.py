@@ -0,0 +1,116 @@
+from sentence_transformers import CrossEncoder, SentenceTransformer
+from utils.config import Config
+import logging
+import resource
+import threading
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Process-wide holder of the sentence encoder used to build graphs and of
+    the NLI cross-encoder that pre-screens contradiction candidates.
+
+    Models are loaded and warmed up once, from the FastAPI lifespan hook or
+    on first use, instead of on every generate_graph_data call.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ModelRegistry, cls).__new__(cls)
+            cls._instance._encoder = None
+            cls._instance._stats = {}
+            cls._instance._cross_encoder = None
+            cls._instance._cross_encoder_stats = {}
+            cls._instance._initialized = False
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def initialize(self):
+        if self._initialized:
+            return
+        # Requests on the threadpool may all get here first, only one loads
+        with self._lock:
+            if not self._initialized:
+                self._load_encoder()
+
+    def _load_encoder(self):
+        logger.info(f"Loading embedding model {Config.EMBEDDING_MODEL}...")
+        if Config.EMBEDDING_THREADS:
+            torch.set_num_threads(Config.EMBEDDING_THREADS)
+
+        rss_before = _max_rss_bytes()
+        start = time.perf_counter()
+        encoder = SentenceTransformer(Config.EMBEDDING_MODEL, device=Config.EMBEDDING_DEVICE)
+        load_seconds = time.perf_counter() - start
+
+        # First encode pays for lazy allocations, keep it out of the first request
+        start = time.perf_counter()
+        encoder.encode(["warm up"], batch_size=Config.EMBEDDING_BATCH_SIZE, show_progress_bar=False)
+        warmup_seconds = time.perf_counter() - start
+
+        self._encoder = encoder
+        self._stats = {
+            "model": Config.EMBEDDING_MODEL,
+            "device": str(encoder.device),
+            "threads": torch.get_num_threads(),
+            "batch_size": Config.EMBEDDING_BATCH_SIZE,
+            "load_seconds": load_seconds,
+            "warmup_seconds": warmup_seconds,
+            "parameter_bytes": sum(p.numel() * p.element_size() for p in encoder.parameters()),
+            "peak_rss_delta_bytes": _max_rss_bytes() - rss_before,
+        }
+        self._initialized = True
+        logger.info(
+            f"Embedding model loaded on {self._stats['device']} in {load_seconds:.2f}s "
+            f"(warm-up {warmup_seconds:.2f}s, {self._stats['parameter_bytes'] / 1024**2:.1f} MiB of parameters)"
+        )
+
+    def get_encoder(self) -> SentenceTransformer:
+        if not self._initialized:
+            self.initialize()
+        return self._encoder
+
+    def get_cross_encoder(self) -> CrossEncoder:
+        if self._cross_encoder is None:
+            with self._lock:
+                if self._cross_encoder is None:
+                    self._load_cross_encoder()
+        return self._cross_encoder
+
+    def _load_cross_encoder(self):
+        logger.info(f"Loading pre-screen model {Config.PRESCREEN_MODEL}...")
+        rss_before = _max_rss_bytes()
+        start = time.perf_counter()
+        # CPU only, the pre-screen has to stay cheap next to the LLM calls it saves
+        cross_encoder = CrossEncoder(Config.PRESCREEN_MODEL, device="cpu")
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cross_encoder.predict([("warm up", "warm up")], show_progress_bar=False)
+        warmup_seconds = time.perf_counter() - start
+
+        self._cross_encoder = cross_encoder
+        self._cross_encoder_stats = {
+            "model": Config.PRESCREEN_MODEL,
+            "load_seconds": load_seconds,
+            "warmup_seconds": warmup_seconds,
+            "parameter_bytes": sum(p.numel() * p.element_size() for p in cross_encoder.parameters()),
+            "peak_rss_delta_bytes": _max_rss_bytes() - rss_before,
+        }
+        logger.info(f"Pre-screen model loaded in {load_seconds:.2f}s (warm-up {warmup_seconds:.2f}s)")
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._initialized,
+            **self._stats,
+            "cross_encoder": {"loaded": self._cross_encoder is not None, **self._cross_encoder_stats},
+        }
+
+
+def _max_rss_bytes() -> int:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
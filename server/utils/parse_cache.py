@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import pyarrow.feather as feather
+
+from utils.utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+PARAGRAPHS_FILE = "paragraphs.arrow"
+LINES_FILE = "lines.arrow"
+
+
+class ParseCache:
+    """
+    Disk cache of PDFReader.PDF_to_dataframe results.
+
+    Entries are keyed by the PDF's SHA-256, the reader parameters and the
+    pipeline version, and stored as uncompressed Arrow IPC files so a warm hit
+    is a memory-mapped load. The least recently used entries are evicted once
+    the cache grows past max_bytes.
+
+    Frames of a hit are not copied out of the mapped files, their numeric
+    columns are read-only views of them.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int, pipeline_version: str):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.pipeline_version = pipeline_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Number and size of the entries, kept as they are written and set from
+        # a scan on first use and on every eviction
+        self._count = None
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    def key(self, pdf_sha256: str, reader) -> str:
+        params = {
+            "MIN_WORDS_PER_PARAGRAPH": reader.MIN_WORDS_PER_PARAGRAPH,
+            "LINE_GAP": reader.LINE_GAP,
+            "TAP_GAP": reader.TAP_GAP,
+            "MAX_PARAGRAPH_REPETITIONS": reader.MAX_PARAGRAPH_REPETITIONS,
+            "pipeline_version": self.pipeline_version,
+        }
+        raw = pdf_sha256 + json.dumps(params, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_or_parse(self, pdf_path, reader, pdf_sha256: str | None = None):
+        key = self.key(pdf_sha256 or file_sha256(pdf_path), reader)
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        df_paragraphs, df_lines = reader.PDF_to_dataframe(str(pdf_path))
+        self.put(key, df_paragraphs, df_lines)
+        return df_paragraphs, df_lines
+
+    def get(self, key: str):
+        entry = self.cache_dir / key
+        try:
+            # One block per column, so numeric columns stay zero-copy instead of being consolidated
+            df_paragraphs = feather.read_table(entry / PARAGRAPHS_FILE, memory_map=True).to_pandas(
+                split_blocks=True, self_destruct=True
+            )
+            df_lines = feather.read_table(entry / LINES_FILE, memory_map=True).to_pandas(
+                split_blocks=True, self_destruct=True
+            )
+            # mtime is the LRU clock
+            os.utime(entry)
+        except (FileNotFoundError, NotADirectoryError):
+            # Missing, or evicted by another request while it was being read
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return df_paragraphs, df_lines
+
+    def put(self, key: str, df_paragraphs, df_lines):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary directory and rename it, readers never see half an entry
+        tmp = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            feather.write_feather(df_paragraphs, tmp / PARAGRAPHS_FILE, compression="uncompressed")
+            feather.write_feather(df_lines, tmp / LINES_FILE, compression="uncompressed")
+            size = sum(f.stat().st_size for f in tmp.iterdir())
+            os.replace(tmp, self.cache_dir / key)
+        except OSError:
+            # Another request stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        with self._lock:
+            if self._bytes is None:
+                self._scan()
+            else:
+                self._count += 1
+                self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                entries.append((entry.stat().st_mtime, size, entry))
+            except FileNotFoundError:
+                # Evicted by another process during the scan
+                continue
+        return entries
+
+    def _scan(self):
+        entries = self._entries() if self.cache_dir.exists() else []
+        self._count = len(entries)
+        self._bytes = sum(size for _, size, _ in entries)
+
+    def _evict(self):
+        # Rescanned here only, which also picks up entries other processes added or removed
+        entries = sorted(self._entries())
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            count -= 1
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted parse cache entry {entry.name}")
+        self._count = count
+        self._bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._bytes is None:
+                self._scan()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self._count,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -1,22 +1,44 @@
+import multiprocessing
 import re
 import fitz  # PyMuPDF
 import pandas as pd
 import numpy as np
 
+from concurrent.futures import ProcessPoolExecutor
 from fuzzywuzzy import fuzz
+from fuzzywuzzy.utils import full_process
+from rapidfuzz import fuzz as rf_fuzz, process
+
+from utils.line_index import LineIndex, clean_text
+
+# Spans dropped after extraction (stray punctuation and bullet glyphs)
+PUNCTUATION_SPANS = [",", '"', ".", "o"]
+
+# Pages handed to each worker in parallel mode
+PAGES_PER_CHUNK = 8
 
 class PDFReader:
     def __init__(self, MIN_WORDS_PER_PARAGRAPH = 6, ##20
                        MAX_PARAGRAPH_REPETITIONS = 3,
                        LINE_GAP = 10,
                        TAP_GAP = 5,
-                       FONT_PATH=None):
+                       FONT_PATH=None,
+                       ENGINE="vectorized",
+                       WORKERS=1,
+                       MATCH_THREADS=1):
         self.ALLOWED_EXTENSIONS = {"pdf"}
         
         self.MIN_WORDS_PER_PARAGRAPH = MIN_WORDS_PER_PARAGRAPH
         self.LINE_GAP = LINE_GAP
         self.TAP_GAP = TAP_GAP
         self.MAX_PARAGRAPH_REPETITIONS = MAX_PARAGRAPH_REPETITIONS
+        # "vectorized" uses the array based stages, "reference" the original row loops
+        self.ENGINE = ENGINE
+        # WORKERS > 1 parses page ranges in a process pool
+        self.WORKERS = WORKERS
+        self._pool = None
+        # Threads rapidfuzz scores repeated paragraphs with
+        self.MATCH_THREADS = MATCH_THREADS
         
         if FONT_PATH is not None:
             self.font_path = f"{FONT_PATH}TimesNewRomanPSMT Regular.ttf"
@@ -24,21 +46,91 @@ class PDFReader:
         
     
     def PDF_to_dataframe(self, pdf_path):
-        pdf_df = self.read_pdf(pdf_path)
-        df_lines = self.set_lines(pdf_df)
+        if self.WORKERS > 1:
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+            if page_count > PAGES_PER_CHUNK:
+                return self.PDF_to_dataframe_parallel(pdf_path, page_count)
+
+        df_lines = self._read_lines(pdf_path)
         df_lines = self.filter_lines(df_lines)
-        df_paragraphs = self.set_paragraphs_intelligent(df_lines)
+        df_paragraphs = self._segment_paragraphs(df_lines)
         df_paragraphs = self.filter_paragraphs(df_paragraphs)
         return df_paragraphs, df_lines
+
+    def PDF_to_dataframe_parallel(self, pdf_path, page_count):
+        """
+        Same result as PDF_to_dataframe with page ranges fanned out to a process pool.
+
+        Workers extract spans and build lines for their pages. Duplicated lines are
+        a document-wide property, so filter_lines runs on the merged lines before
+        the filtered pages go back to the pool for paragraph segmentation.
+        filter_paragraphs runs once at the end over the whole document.
+        """
+        chunks = [range(start, min(start + PAGES_PER_CHUNK, page_count))
+                  for start in range(0, page_count, PAGES_PER_CHUNK)]
+
+        pool = self._get_pool()
+        params = self._params()
+
+        # Results come back in submission order, i.e. in page order
+        line_chunks = pool.map(_lines_worker, [(params, str(pdf_path), pages) for pages in chunks])
+        df_lines = pd.concat([df for df in line_chunks if not df.empty], ignore_index=True)
+        df_lines = self.filter_lines(df_lines)
+
+        page_chunks = [df_lines[df_lines["page"].between(pages.start + 1, pages.stop)] for pages in chunks]
+        paragraph_chunks = pool.map(_paragraphs_worker, [(params, df) for df in page_chunks if not df.empty])
+        df_paragraphs = pd.concat([df for df in paragraph_chunks if not df.empty], ignore_index=True)
+        df_paragraphs = self.filter_paragraphs(df_paragraphs)
+
+        return df_paragraphs, df_lines
+
+    def _read_lines(self, pdf_path, pages=None):
+        if self.ENGINE == "reference":
+            # read_pdf has no page ranges, parallel mode reads columnar in both engines
+            pdf_df = self.read_pdf(pdf_path) if pages is None else self.read_pdf_columnar(pdf_path, pages)
+            return self.set_lines(pdf_df)
+        return self.set_lines_vectorized(self.read_pdf_columnar(pdf_path, pages))
+
+    def _segment_paragraphs(self, df_lines):
+        if self.ENGINE == "reference":
+            return self.set_paragraphs_intelligent(df_lines)
+        return self.set_paragraphs_vectorized(df_lines)
+
+    def _params(self):
+        return {
+            "MIN_WORDS_PER_PARAGRAPH": self.MIN_WORDS_PER_PARAGRAPH,
+            "MAX_PARAGRAPH_REPETITIONS": self.MAX_PARAGRAPH_REPETITIONS,
+            "LINE_GAP": self.LINE_GAP,
+            "TAP_GAP": self.TAP_GAP,
+            "ENGINE": self.ENGINE,
+        }
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Spawned workers, a forked child would inherit the server's threads and locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
         
     ############################################
     ###             Read PDF                 ###
     ############################################
     
     def clean_text(self, t):
-            return re.sub(r'[^a-zA-Z0-9]', '', t).lower()
+            return clean_text(t)
     
-    def get_text_bbox(self, evidence_snippet, df_lines, page_num):
+    def get_text_bbox(self, evidence_snippet, lines, page_num):
+        """
+        Box around the lines of page_num that hold the snippet. lines is the
+        document's LineIndex, a line frame is indexed on the spot.
+        """
         if not evidence_snippet or not isinstance(evidence_snippet, str):
             return None
         
@@ -46,44 +138,9 @@ class PDFReader:
         if len(snippet) < 3:
             return None
 
-        page_lines = df_lines[df_lines['page'] == page_num].copy()
-        if page_lines.empty:
-            return None
-
-        snippet_clean = self.clean_text(snippet)
-        matching_boxes = []
-
-        for _, line in page_lines.iterrows():
-            line_text = str(line['text'])
-            line_clean = self.clean_text(line_text)
-            
-            if not line_clean:
-                continue
-
-            if line_clean in snippet_clean or snippet_clean in line_clean:
-                matching_boxes.append([line['x0'], line['y0'], line['x1'], line['y1']])
-                continue
-
-            if fuzz.partial_ratio(line_clean, snippet_clean) > 90:
-                matching_boxes.append([line['x0'], line['y0'], line['x1'], line['y1']])
-
-        if not matching_boxes:
-            keywords = [self.clean_text(w) for w in snippet.split() if len(w) > 3]
-            for _, line in page_lines.iterrows():
-                line_clean = self.clean_text(str(line['text']))
-                matches = sum(1 for kw in keywords if kw in line_clean)
-                if matches >= 2:
-                    matching_boxes.append([line['x0'], line['y0'], line['x1'], line['y1']])
-
-        if not matching_boxes:
-            return None
-
-        x0 = min(box[0] for box in matching_boxes)
-        y0 = min(box[1] for box in matching_boxes)
-        x1 = max(box[2] for box in matching_boxes)
-        y1 = max(box[3] for box in matching_boxes)
-
-        return [float(x0), float(y0), float(x1), float(y1)]
+        if not isinstance(lines, LineIndex):
+            lines = LineIndex(lines)
+        return lines.bbox(snippet, page_num)
 
     def _allowed_file(self, filename):
         return "." in filename and filename.rsplit(".", 1)[1].lower() in self.ALLOWED_EXTENSIONS
@@ -174,6 +231,95 @@ class PDFReader:
         df_res = df_res.loc[df['text'] != 'o']
         df_res = df_res.reset_index(drop=True)
         return df_res
+
+    def read_pdf_columnar(self, pdf_path, pages=None):
+        """
+        Columnar version of read_pdf: spans are written straight into
+        preallocated arrays and filtered in one vectorized pass.
+        Returns a frame with the same schema and rows as read_pdf.
+        `pages` restricts extraction to a range of 0-based page indexes.
+        """
+        doc = fitz.open(pdf_path)
+        if pages is None:
+            pages = range(doc.page_count)
+
+        size = max(len(pages), 1) * 256
+        page = np.empty(size, dtype=np.int64)
+        bbox = np.empty((size, 4), dtype=np.float64)
+        font_size = np.empty(size, dtype=np.float64)
+        opacity = np.empty(size, dtype=np.float64)
+        color = np.empty(size, dtype=np.int64)
+        tokens = np.empty(size, dtype=np.int64)
+        font = np.empty(size, dtype=object)
+        text = np.empty(size, dtype=object)
+
+        n = 0
+        for page_num in pages:
+            blocks = doc[page_num].get_text("dict")["blocks"]
+            spans = [span for block in blocks for line in block.get("lines", ()) for span in line["spans"]]
+
+            if n + len(spans) > size:
+                size = max(2 * size, n + len(spans))
+                page = np.resize(page, size)
+                bbox = np.resize(bbox, (size, 4))
+                font_size = np.resize(font_size, size)
+                opacity = np.resize(opacity, size)
+                color = np.resize(color, size)
+                tokens = np.resize(tokens, size)
+                font = np.resize(font, size)
+                text = np.resize(text, size)
+
+            for span in spans:
+                span_text = span["text"].strip()
+                page[n] = page_num + 1
+                bbox[n] = span["bbox"]
+                font_size[n] = span["size"]
+                opacity[n] = span.get("opacity", 1)
+                color[n] = span["color"]
+                tokens[n] = len(span_text.split())
+                font[n] = span["font"]
+                text[n] = span_text
+                n += 1
+
+        doc.close()
+
+        # Watermarks go before numbering, like in read_pdf
+        keep = (opacity[:n] >= 1) & (font_size[:n] <= 20)
+        idx = np.flatnonzero(keep)
+        order = idx[np.lexsort((bbox[idx, 0], bbox[idx, 1], page[idx]))]
+
+        page = page[order]
+        x0, y0, x1, y1 = bbox[order, 0], bbox[order, 1], bbox[order, 2], bbox[order, 3]
+        # 1-based position of each span inside its page
+        paragraph_enum = np.arange(len(order)) - np.searchsorted(page, page, side="left") + 1
+
+        # Drop empty and punctuation-only spans
+        text = text[order]
+        tokens = tokens[order]
+        keep = (tokens != 0) & ~np.isin(text, PUNCTUATION_SPANS)
+
+        color = color[order][keep]
+        rgb = zip(
+            (((color >> 16) & 255) / 255.0).tolist(),
+            (((color >> 8) & 255) / 255.0).tolist(),
+            ((color & 255) / 255.0).tolist(),
+        )
+
+        df = pd.DataFrame({
+            "page": page[keep],
+            "paragraph_enum": paragraph_enum[keep],
+            "font": font[order][keep],
+            "text": text[keep],
+            "y0": y0[keep],
+            "x0": x0[keep],
+            "y1": y1[keep],
+            "x1": x1[keep],
+            "color": list(rgb),
+            "tokens": tokens[keep],
+            "font_size": font_size[order][keep],
+            "height": y1[keep] - y0[keep],
+        })
+        return df
         
         
     ###########################################
@@ -202,11 +348,7 @@ class PDFReader:
         df['text_wo_numbers_len'] = df.text_wo_numbers.apply(lambda x: len(x.split()))
     
         df['text_duplicated'] = df.text_wo_numbers.duplicated(keep=False)
-    
-        for index, row in df.iterrows():
-            num_paragraph = index+1
-            if row["only_special_len"] == 0:
-                df.loc[index, "empty_line"] = True
+        df["empty_line"] = df.only_special_len == 0
 
         df['to_delete_line'] = df.empty_line | df.text_duplicated
         
@@ -271,6 +413,51 @@ class PDFReader:
         doc_df["text"] = doc_df["text"].apply(lambda x: re.sub(r"\s+", " ", x).strip())
 
         return doc_df
+
+    def set_lines_vectorized(self, _df, y_tolerance=2.5):
+        """
+        Array version of set_lines with the same output.
+
+        A line starts at an anchor span and keeps every following span of the page
+        whose y0 stays within y_tolerance of the anchor (not of the previous span),
+        so anchors are found with one searchsorted per line instead of per span.
+        """
+        df = _df.sort_values(by=["page", "y0", "x0"])
+        page = df["page"].to_numpy()
+        y0 = df["y0"].to_numpy()
+
+        new_line = np.zeros(len(df), dtype=bool)
+        page_starts = np.flatnonzero(np.r_[True, page[1:] != page[:-1]]) if len(df) else np.empty(0, dtype=int)
+        page_ends = np.r_[page_starts[1:], len(df)]
+
+        for start, end in zip(page_starts, page_ends):
+            i = start
+            while i < end:
+                new_line[i] = True
+                i += np.searchsorted(y0[i:end] - y0[i], y_tolerance, side="right")
+
+        df["line_id"] = np.cumsum(new_line)
+        words = df[df["tokens"] > 0]
+
+        doc_df = words.groupby("line_id").agg(
+            page=("page", "first"),
+            text=("text", " ".join),
+            x0=("x0", "min"),
+            y0=("y0", "min"),
+            x1=("x1", "max"),
+            y1=("y1", "max"),
+        ).reset_index(drop=True)
+        doc_df.insert(1, "line_enum", doc_df.groupby("page").cumcount())
+        doc_df.insert(3, "tokens", doc_df["text"].str.split().str.len())
+
+        # width & height
+        doc_df["width"] = round(doc_df.x1 - doc_df.x0 + 0.025, 5)
+        doc_df["height"] = round(doc_df.y1 - doc_df.y0 + 0.025, 5)
+
+        # clean spaces in the *line-level* text
+        doc_df["text"] = doc_df["text"].apply(lambda x: re.sub(r"\s+", " ", x).strip())
+
+        return doc_df
         
         
     ############################################
@@ -287,13 +474,12 @@ class PDFReader:
         
         # Calcular gaps entre líneas consecutivas
         page_df_sorted = page_df.sort_values(by=["y0", "x0"])
-        gaps = []
-        for i in range(1, len(page_df_sorted)):
-            current_y = page_df_sorted.iloc[i]['y0']
-            prev_y = page_df_sorted.iloc[i-1]['y1']
-            gap = current_y - prev_y
-            if gap > 0:  # Solo gaps positivos
-                gaps.append(gap)
+        return self._page_statistics(heights, page_df_sorted['y0'].to_numpy(), page_df_sorted['y1'].to_numpy(), font_sizes)
+
+    def _page_statistics(self, heights, y0, y1, font_sizes=()):
+        # y0/y1 of the page lines sorted by (y0, x0)
+        gaps = y0[1:] - y1[:-1]
+        gaps = gaps[gaps > 0]  # Solo gaps positivos
         
         stats_dict = {
             'mean_height': np.mean(heights) if len(heights) > 0 else 12,
@@ -454,15 +640,11 @@ class PDFReader:
         df = _df.copy()
         df.sort_values(by=["page", "y0", "x0"], inplace=True)
         
-        num_pages = len(df["page"].unique())
         doc_df = pd.DataFrame()
 
-        for cur_page in range(1, num_pages + 1):
+        for cur_page in sorted(df["page"].unique()):
             page_df = df[df["page"] == cur_page].sort_values(by=["y0", "x0"])
             
-            if page_df.empty:
-                continue
-            
             # Analizar estadísticas de la página
             page_stats = self._analyze_page_statistics(page_df)
             
@@ -518,6 +700,84 @@ class PDFReader:
 
         return doc_df
     
+    def set_paragraphs_vectorized(self, _df):
+        """
+        Array version of set_paragraphs_intelligent with the same decisions.
+
+        Text features are computed once per line, every criterion of
+        _is_paragraph_break becomes a boolean array over the whole document and
+        paragraphs are the cumsum of the breaks.
+        """
+        df = _df.sort_values(by=["page", "y0", "x0"]).reset_index(drop=True)
+        if df.empty:
+            return pd.DataFrame()
+
+        n = len(df)
+        rows = np.arange(n)
+        page = df["page"].to_numpy()
+        first = np.r_[True, page[1:] != page[:-1]]
+        page_start = np.maximum.accumulate(np.where(first, rows, 0))
+
+        y0 = df["y0"].to_numpy()
+        y1 = df["y1"].to_numpy()
+        heights = df["height"].to_numpy()
+
+        # Page statistics broadcast to every line of the page
+        bounds = np.r_[np.flatnonzero(first), n]
+        stats = [self._page_statistics(heights[a:b], y0[a:b], y1[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        page_idx = np.cumsum(first) - 1
+        gap_threshold = np.array([s.get('dynamic_paragraph_threshold', 8) for s in stats])[page_idx]
+        typical_gap = np.array([s.get('typical_line_gap', 2) for s in stats])[page_idx]
+
+        # previous_row is the line right above, previous_text the last line with tokens
+        vertical_gap = y0 - np.r_[np.nan, y1[:-1]]
+
+        has_tokens = df["tokens"].to_numpy() > 0
+        last_text = np.maximum.accumulate(np.where(has_tokens, rows, -1))
+        prev_text = np.r_[-1, last_text[:-1]]
+        prev_text[prev_text < page_start] = -1
+
+        # Extra last row holds the features of "", picked by prev_text == -1
+        features = np.array([_line_features(text.strip()) for text in df["text"]] + [_line_features("")], dtype=bool)
+        curr_caps, curr_starts = features[:n, 0], features[:n, 2]
+        prev_caps, prev_ends, prev_short, prev_title = (features[prev_text, k] for k in (0, 1, 3, 4))
+
+        # Same priority as _is_paragraph_break
+        is_break = np.select(
+            [
+                first,
+                vertical_gap > gap_threshold,
+                (vertical_gap > typical_gap * 1.5) & (prev_ends | curr_starts),
+                prev_caps & curr_caps,
+                prev_caps & ~curr_caps,
+                prev_title & (vertical_gap > typical_gap * 0.8),
+                prev_ends & curr_starts & (vertical_gap > typical_gap),
+                prev_short & (vertical_gap > typical_gap * 1.2),
+            ],
+            [True, True, True, False, True, True, True, True],
+            default=False,
+        )
+
+        df["paragraph_id"] = np.cumsum(is_break)
+        words = df[has_tokens]
+
+        doc_df = words.groupby("paragraph_id").agg(
+            page=("page", "first"),
+            text=("text", " ".join),
+            x0=("x0", "min"),
+            y0=("y0", "min"),
+            x1=("x1", "max"),
+            y1=("y1", "max"),
+        ).reset_index(drop=True)
+        doc_df["text"] = doc_df["text"].str.strip()
+        doc_df.insert(1, "paragraph_enum", doc_df.groupby("page").cumcount())
+        doc_df.insert(3, "tokens", doc_df["text"].str.split().str.len())
+
+        doc_df['width'] = round(doc_df.x1 - doc_df.x0 + 0.025, 5)
+        doc_df['height'] = round(doc_df.y1 - doc_df.y0 + 0.025, 5)
+
+        return doc_df
+
     def set_paragraphs(self, df):
         df.sort_values(by=["page", "y0", "x0"], inplace=True)
         
@@ -600,8 +860,6 @@ class PDFReader:
 
     def filter_paragraphs(self, _df):
         df = _df.copy()
-        similar_texts = []
-        repeatd_ids = []
         
         df["clean_text"] = df["text"].apply(lambda x: re.sub(r"\s+", " ", x).strip())
         
@@ -614,6 +872,31 @@ class PDFReader:
     
         df['paragraph_duplicated'] = df.text_wo_numbers.duplicated(keep=False)
         
+        if self.ENGINE == "reference":
+            similar_texts = self._mark_repetitions_exhaustive(df)
+        else:
+            similar_texts = self._mark_repetitions_blocked(df)
+        
+        df['has_similar'] = df.clean_text.isin(similar_texts)
+        df['to_delete_paragraph'] = df.has_similar | df.paragraph_duplicated | (df.text_wo_numbers_len < self.MIN_WORDS_PER_PARAGRAPH) | df[f'repeats_more_than_{self.MAX_PARAGRAPH_REPETITIONS}']
+
+        df_deleted = df[~df.to_delete_paragraph][["page", "paragraph_enum", "text", "clean_text", "y0", "x0", "y1", "x1"]].copy()
+        df_deleted = df_deleted.reset_index(drop=True)
+        
+        df_deleted['width'] = abs(df_deleted.x1 - df_deleted.x0)
+        df_deleted['height'] = abs(df_deleted.y1 - df_deleted.y0)
+
+        return df_deleted
+    
+    def _mark_repetitions_exhaustive(self, df):
+        """
+        Reference near-duplicate search: every kept paragraph is scored against
+        the whole column. Marks the repetition columns in place and returns the
+        texts repeated at least MAX_PARAGRAPH_REPETITIONS times.
+        """
+        similar_texts = []
+        repeatd_ids = []
+        
         for i, clean_text, text_wo_numbers in df[['clean_text', 'text_wo_numbers']].itertuples():
             num_paragraph = i+1
             if clean_text in similar_texts or num_paragraph in repeatd_ids:
@@ -634,18 +917,70 @@ class PDFReader:
                 df.loc[is_similar, "repeated_with"] = num_paragraph
                 df.loc[is_similar, "number_repetitions"] = len(ids_with)
                 df.loc[is_similar, f'repeats_more_than_{self.MAX_PARAGRAPH_REPETITIONS}'] = False
-        
-        df['has_similar'] = df.clean_text.isin(similar_texts)
-        df['to_delete_paragraph'] = df.has_similar | df.paragraph_duplicated | (df.text_wo_numbers_len < self.MIN_WORDS_PER_PARAGRAPH) | df[f'repeats_more_than_{self.MAX_PARAGRAPH_REPETITIONS}']
 
-        df_deleted = df[~df.to_delete_paragraph][["page", "paragraph_enum", "text", "clean_text", "y0", "x0", "y1", "x1"]].copy()
-        df_deleted = df_deleted.reset_index(drop=True)
-        
-        df_deleted['width'] = abs(df_deleted.x1 - df_deleted.x0)
-        df_deleted['height'] = abs(df_deleted.y1 - df_deleted.y0)
+        return similar_texts
+
+    def _mark_repetitions_blocked(self, df, tile_rows=256):
+        """
+        Same marks as _mark_repetitions_exhaustive, scored in row tiles with
+        rapidfuzz instead of one fuzzywuzzy call per pair.
+
+        Strings get fuzzywuzzy's own preprocessing, and fuzzywuzzy rounds the
+        score to an int before the > 90 test, hence the 90.5 cutoff. The score
+        is symmetric, so a tile is only scored against the columns from its
+        first row on. Hits left of the tile come from earlier tiles. Only the
+        hits are kept, so memory stays at tile_rows x n plus the similar pairs.
+        """
+        col = f'repeats_more_than_{self.MAX_PARAGRAPH_REPETITIONS}'
+        n = len(df)
+        processed = [full_process(text, force_ascii=True) for text in df["text_wo_numbers"]]
+        enums = df["paragraph_enum"].to_numpy()
+        clean_texts = df["clean_text"].tolist()
+
+        repeated_with = np.full(n, np.nan)
+        number_repetitions = np.full(n, np.nan)
+        repeats = np.full(n, np.nan, dtype=object)
+
+        # hits[row] lists the similar rows (ascending) once the row's tile is scored
+        hits = [[] for _ in range(n)]
+        similar_texts = set()
+        repeatd_ids = set()
+        scored = 0
+
+        for row, index in enumerate(df.index):
+            if row >= scored:
+                start, scored = scored, min(scored + tile_rows, n)
+                tile = process.cdist(
+                    processed[start:scored], processed[start:],
+                    scorer=rf_fuzz.token_set_ratio, score_cutoff=90.5,
+                    dtype=np.float64, workers=self.MATCH_THREADS,
+                )
+                for r, cols in enumerate(tile > 90.5):
+                    cols = np.flatnonzero(cols) + start
+                    hits[start + r].extend(cols.tolist())
+                    for c in cols[cols >= scored]:
+                        hits[c].append(start + r)
+
+            num_paragraph = index + 1
+            if clean_texts[row] in similar_texts or num_paragraph in repeatd_ids:
+                continue
+
+            is_similar = np.array(hits[row], dtype=int)
+            repeated_with[is_similar] = num_paragraph
+            number_repetitions[is_similar] = len(is_similar)
+
+            if self.MAX_PARAGRAPH_REPETITIONS <= len(is_similar):
+                similar_texts.add(clean_texts[row])
+                repeatd_ids.update(enums[is_similar].tolist())
+                repeats[is_similar] = True
+            else:
+                repeats[is_similar] = False
+
+        df["repeated_with"] = repeated_with
+        df["number_repetitions"] = number_repetitions
+        df[col] = repeats
+        return list(similar_texts)
 
-        return df_deleted
-    
     def filter_paragraphs_in_bbox(self, df_, page_num, new_bbox):
         # bbox = [x, y, width, height]
         x, y, w, h = new_bbox
@@ -692,3 +1027,66 @@ class PDFReader:
         
         
         
+
+
+
+############################################
+###       Paragraph break features       ###
+############################################
+
+SENTENCE_ENDINGS = ('.', '!', '?', ':', ';', '."', '.)', '".', '").', '"),', '";', '":')
+PARAGRAPH_NUMBERING = re.compile(r'[IVX]+\.|\d+\.|[a-z]\)')
+PARAGRAPH_BULLETS = ('•', '-', '*', '(', '[')
+PARAGRAPH_WORDS = (
+    'art.', 'artigo', 'parágrafo', '§', 'inciso',
+    'considerando', 'portanto', 'assim', 'desta',
+    'neste', 'pelo', 'conforme', 'segundo',
+    'outrossim', 'ademais', 'contudo', 'todavia',
+    'entretanto', 'por', 'ante', 'diante', 'face'
+)
+
+def _is_all_caps(text, min_len=5):
+    letters = "".join(filter(str.isalpha, text))
+    if not letters or len(text) < min_len:
+        return False
+    return sum(map(str.isupper, letters)) / len(letters) > 0.8
+
+def _line_features(text):
+    """
+    Text criteria of _is_paragraph_break for one stripped line, as
+    (all_caps, ends_sentence, starts_like_paragraph, is_short, is_title).
+    """
+    n_words = len(text.split())
+    return (
+        _is_all_caps(text),
+        bool(text) and text.endswith(SENTENCE_ENDINGS),
+        bool(text) and bool(
+            text[0].isupper()
+            or PARAGRAPH_NUMBERING.match(text)
+            or text.startswith(PARAGRAPH_BULLETS)
+            or text.lower().startswith(PARAGRAPH_WORDS)
+        ),
+        n_words < 8,
+        bool(text) and (text.isupper() and len(text) > 5 or text.endswith(':') and n_words < 10),
+    )
+
+
+############################################
+###           Parallel workers           ###
+############################################
+
+_worker_readers = {}
+
+def _worker_reader(params):
+    key = tuple(sorted(params.items()))
+    if key not in _worker_readers:
+        _worker_readers[key] = PDFReader(**params)
+    return _worker_readers[key]
+
+def _lines_worker(args):
+    params, pdf_path, pages = args
+    return _worker_reader(params)._read_lines(pdf_path, pages)
+
+def _paragraphs_worker(args):
+    params, df_lines = args
+    return _worker_reader(params)._segment_paragraphs(df_lines)
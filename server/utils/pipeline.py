@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from schemas.contradiction import Contradiction
+from utils.config import Config
+from utils.contradictions import BATCH_PROMPT_HASH, PROMPT_HASH, postfilter_and_rank, within_budget
+from utils.document_model import DocumentModel
+from utils.graph_codec import complete_edges
+from utils.line_index import LineIndex
+from utils.relations import SIMILARITY_THRESHOLD, generate_graph_data
+from utils.rules import detect_conflicts
+from utils.utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Bump when a change alters /process results but not parses or graphs
+RESULT_VERSION = 3
+
+
+def raw_candidate(edge: dict, result: dict) -> dict:
+    return {
+        "source": edge["source"],
+        "target": edge["target"],
+        "edge_type": edge["type"],
+        "edge_score": edge.get("score"),
+        "result": result
+    }
+
+
+def graph_fingerprint(pdf_reader) -> str:
+    """
+    Hash of everything besides the PDF itself that shapes a document's nodes
+    and edges.
+    """
+    params = {
+        "pipeline_version": Config.PIPELINE_VERSION,
+        "reader": [
+            pdf_reader.MIN_WORDS_PER_PARAGRAPH,
+            pdf_reader.LINE_GAP,
+            pdf_reader.TAP_GAP,
+            pdf_reader.MAX_PARAGRAPH_REPETITIONS,
+        ],
+        "embedding_model": Config.EMBEDDING_MODEL,
+        "similarity_threshold": SIMILARITY_THRESHOLD,
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def pipeline_fingerprint(pdf_reader, classifier) -> str:
+    """
+    Hash of everything besides the PDF itself that shapes a /process result.
+    """
+    params = {
+        "graph": graph_fingerprint(pdf_reader),
+        "result_version": RESULT_VERSION,
+        "rules": Config.RULES_ENABLED,
+        "llm": None if classifier.offline else [classifier.model, PROMPT_HASH, BATCH_PROMPT_HASH],
+        "prescreen": [
+            Config.PRESCREEN_MODEL,
+            Config.PRESCREEN_THRESHOLD,
+            Config.PRESCREEN_TOP_N,
+        ] if Config.PRESCREEN_ENABLED else None,
+        "llm_budget": Config.LLM_CALL_BUDGET,
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class DocumentPipeline:
+    """
+    The steps of /process as a stream of events, so callers can show results
+    as soon as each step has them:
+
+    - "nodes": the paragraphs, once the PDF is parsed
+    - "edges": the relations between them, once the graph is built, and
+      relationsCount, the count of every node in node order; the nodes
+      event went out before they were counted and is never changed after
+    - "contradiction": one per verdict that passes postfilter_and_rank, with
+      its evidence bboxes resolved; rule verdicts come first, LLM ones as
+      their requests finish
+    - "summary": every contradiction, ranked, and the time each step took
+
+    The graph is kept in the result store once the summary is out.
+
+    Blocking steps run on the pipeline's own thread pool, the event loop
+    keeps serving other requests and flushing events in the meantime.
+    """
+
+    def __init__(
+        self,
+        pdf_reader,
+        parse_cache,
+        document_store,
+        model_registry,
+        embedding_cache,
+        classifier,
+        prescreen,
+        result_store,
+        threads: int = 2,
+    ):
+        self.pdf_reader = pdf_reader
+        self.parse_cache = parse_cache
+        self.document_store = document_store
+        self.model_registry = model_registry
+        self.embedding_cache = embedding_cache
+        self.classifier = classifier
+        self.prescreen = prescreen
+        self.result_store = result_store
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pipeline")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def events(self, pdf_path: str, document_id: str, pdf_sha256: str | None = None):
+        start = time.perf_counter()
+        timings = {}
+
+        def lap(step):
+            timings[step] = time.perf_counter() - start - sum(timings.values())
+
+        if pdf_sha256 is None:
+            pdf_sha256 = await self._run(file_sha256, pdf_path)
+        df_paragraphs, df_lines = await self._run(
+            self.parse_cache.get_or_parse, pdf_path, self.pdf_reader, pdf_sha256
+        )
+
+        document, graph_data = await self._run(self._document, document_id, pdf_sha256, df_paragraphs)
+        lap("parse_seconds")
+        nodes_out = await self._run(document.to_nodes)
+        yield {"event": "nodes", "nodes": nodes_out}
+
+        if graph_data is None:
+            graph_data = await self._run(
+                generate_graph_data, document, self.model_registry.get_encoder(), self.embedding_cache
+            )
+            await self._run(self.document_store.save_graph, document_id, graph_data, pdf_sha256)
+            # New dicts with the counts, the nodes event keeps what was sent
+            nodes_out = await self._run(document.to_nodes)
+        edges = await self._run(complete_edges, graph_data["edges"])
+        lap("graph_seconds")
+        yield {"event": "edges", "edges": edges, "relationsCount": document.relations.tolist()}
+
+        candidates = await self._run(self._candidates, edges, document)
+
+        contradictions = []
+        # Built once, every evidence lookup of the document goes through it
+        line_index = None
+
+        async def resolve(order, candidate):
+            nonlocal line_index
+            # Ranking each verdict on its own gives the same scores as ranking them all at once
+            for c in await self._run(postfilter_and_rank, [candidate]):
+                if line_index is None:
+                    line_index = await self._run(LineIndex, df_lines)
+                contradiction = await self._run(self._contradiction, c, document, line_index)
+                contradictions.append((order, contradiction))
+                return {"event": "contradiction", "contradiction": contradiction.model_dump()}
+            return None
+
+        if Config.RULES_ENABLED:
+            rule_results = await self._run(detect_conflicts, candidates)
+            for position, ((e, _, _), result) in enumerate(zip(candidates, rule_results)):
+                if result and (event := await resolve((0, position), raw_candidate(e, result))):
+                    yield event
+            # Pairs the rules settled never go to the LLM
+            candidates = [c for c, result in zip(candidates, rule_results) if result is None]
+
+        if self.classifier.offline:
+            logger.info("No OpenAI API key configured, using the rule based detector only")
+            candidates = []
+        elif Config.PRESCREEN_ENABLED:
+            selected, _ = await self._run(self.prescreen.select, [(a, b) for _, a, b in candidates])
+            candidates = [candidates[i] for i in selected]
+        elif len(candidates) > Config.LLM_CALL_BUDGET:
+            # The pre-screen caps the calls when it runs, without it reference pairs go first, then by similarity
+            ranked = sorted(
+                range(len(candidates)),
+                key=lambda i: (not candidates[i][0]["type"].startswith("reference"), -(candidates[i][0]["score"] or 0.0)),
+            )
+            selected = within_budget([(a, b) for _, a, b in candidates], ranked, Config.LLM_CALL_BUDGET)
+            logger.info(f"LLM call budget keeps {len(selected)}/{len(candidates)} pairs")
+            candidates = [candidates[i] for i in selected]
+
+        llm_report = {}
+        verdicts = self.classifier.classify_iter(
+            [(a, b) for _, a, b in candidates],
+            deadline=Config.LLM_DOCUMENT_DEADLINE,
+            report=llm_report,
+        )
+        async for position, result in verdicts:
+            if result and (event := await resolve((1, position), raw_candidate(candidates[position][0], result))):
+                yield event
+        lap("contradiction_seconds")
+
+        ranked = await self._run(_rank, contradictions)
+        yield {
+            "event": "summary",
+            "contradictions": ranked,
+            "timings": {**timings, "total_seconds": time.perf_counter() - start},
+        }
+
+        # A result missing verdicts that timed out would be served as final, leave it to the next run
+        if llm_report.get("timed_out"):
+            logger.info(f"Not storing the result for {document_id}, {llm_report['timed_out']} pairs timed out")
+        else:
+            # Nodes, edges and contradictions are already in the shape of Graph.model_dump()
+            graph = {"nodes": nodes_out, "edges": edges, "contradictions": ranked}
+            await self._run(self.result_store.save, document_id, pdf_sha256, graph)
+
+    def _document(self, document_id: str, pdf_sha256: str, df_paragraphs) -> tuple[DocumentModel, dict | None]:
+        """
+        The document's model and its stored graph, None when it has none yet.
+        """
+        # Reuse the graph built by scripts.preprocess_cuad or a previous request
+        graph_data = self.document_store.get_graph(document_id, pdf_sha256)
+        if graph_data is not None:
+            return DocumentModel.from_nodes(graph_data["nodes"], document_id), graph_data
+        return DocumentModel.from_dataframe(df_paragraphs, document_id), None
+
+    @staticmethod
+    def _candidates(edges: list[dict], document: DocumentModel) -> list[tuple[dict, str, str]]:
+        """
+        (edge, text A, text B) of the edges worth checking for a contradiction.
+        """
+        candidates = []
+        for e in edges:
+            et = e.get("type", "")
+            if not (et.startswith("reference") or et == "semantic_similarity"):
+                continue
+
+            a = document.text(e["source"])
+            b = document.text(e["target"])
+            if not a or not b:
+                continue
+
+            candidates.append((e, a, b))
+        return candidates
+
+    def _contradiction(self, c: dict, document: DocumentModel, line_index: LineIndex) -> Contradiction:
+        source_page = document.page(c["source"])
+        target_page = document.page(c["target"])
+
+        ev_a = c["result"].get("evidence", {}).get("source", "")
+        ev_b = c["result"].get("evidence", {}).get("target", "")
+
+        bbox_a = self.pdf_reader.get_text_bbox(ev_a, line_index, source_page)
+        bbox_b = self.pdf_reader.get_text_bbox(ev_b, line_index, target_page)
+
+        return Contradiction(
+            source=c["source"],
+            target=c["target"],
+            type=c["result"].get("type", "other"),
+            confidence=float(c["result"].get("confidence", 0.0)),
+            edge_type=c["edge_type"],
+            edge_score=c.get("edge_score"),
+            evidence_a=ev_a,
+            evidence_b=ev_b,
+            evidence_a_bbox=bbox_a,
+            evidence_b_bbox=bbox_b,
+            evidence_a_page=source_page,
+            evidence_b_page=target_page,
+            summary=c["result"].get("summary", ""),
+            score=float(c.get("final_score", 0.0)),
+        )
+
+
+def _rank(contradictions: list[tuple[tuple, Contradiction]]) -> list[dict]:
+    # Same order as ranking all verdicts at once, rule verdicts before LLM ones on ties
+    contradictions.sort(key=lambda item: (-item[1].score, item[0]))
+    return [c.model_dump() for _, c in contradictions]
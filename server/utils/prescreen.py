@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from utils.contradictions import within_budget
+from utils.models import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ContradictionPrescreen:
+    """
+    Scores candidate pairs with a local NLI cross-encoder, in batches, and
+    keeps only the likely contradictions for the LLM.
+
+    Pairs whose contradiction probability reaches threshold are escalated, best
+    first, up to top_n (0 for no limit) and never more than llm_budget distinct
+    pairs per document. Everything else counts as an LLM call saved.
+    """
+
+    def __init__(self, model_registry: ModelRegistry, threshold: float, top_n: int, llm_budget: int, batch_size: int = 32):
+        self.model_registry = model_registry
+        self.threshold = threshold
+        self.top_n = top_n
+        self.llm_budget = llm_budget
+        self.batch_size = batch_size
+
+        self.documents = 0
+        self.candidates = 0
+        self.escalated = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def contradiction_scores(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        cross_encoder = self.model_registry.get_cross_encoder()
+        labels = {label.lower(): index for index, label in cross_encoder.config.id2label.items()}
+        if "contradiction" not in labels:
+            raise ValueError(f"Pre-screen model has no contradiction label: {cross_encoder.config.id2label}")
+
+        probabilities = cross_encoder.predict(
+            pairs,
+            batch_size=self.batch_size,
+            apply_softmax=True,
+            show_progress_bar=False,
+        )
+        return probabilities[:, labels["contradiction"]]
+
+    def select(self, pairs: list[tuple[str, str]]) -> tuple[list[int], dict]:
+        """
+        Positions of the pairs to send to the LLM, in input order, and a report
+        of the screening for this document.
+        """
+        start = time.perf_counter()
+        if pairs:
+            scores = self.contradiction_scores(pairs)
+        else:
+            scores = np.zeros(0)
+
+        # Stable sort, equal scores keep the edge order
+        ranked = np.argsort(-scores, kind="stable")
+        ranked = ranked[scores[ranked] >= self.threshold]
+        if self.top_n:
+            ranked = ranked[:self.top_n]
+        selected = within_budget(pairs, ranked.tolist(), self.llm_budget)
+        seconds = time.perf_counter() - start
+
+        report = {
+            "candidates": len(pairs),
+            "escalated": len(selected),
+            "calls_saved": len(pairs) - len(selected),
+            "seconds": seconds,
+        }
+        with self._lock:
+            self.documents += 1
+            self.candidates += len(pairs)
+            self.escalated += len(selected)
+            self.seconds += seconds
+
+        logger.info(
+            f"Pre-screen escalated {len(selected)}/{len(pairs)} pairs to the LLM "
+            f"({report['calls_saved']} calls saved) in {seconds:.2f}s"
+        )
+        return selected, report
+
+    def stats(self) -> dict:
+        return {
+            "documents": self.documents,
+            "candidates": self.candidates,
+            "escalated": self.escalated,
+            "calls_saved": self.candidates - self.escalated,
+            "seconds": self.seconds,
+            "threshold": self.threshold,
+            "top_n": self.top_n,
+            "llm_budget": self.llm_budget,
+        }
@@ -1,13 +1,22 @@
 from sentence_transformers import SentenceTransformer, util
 from collections import Counter
-from .static import REFERENCE_PATTERNS
+from .config import Config
+from .document_model import DocumentModel
+from .embedding_cache import EmbeddingCache
+from .models import ModelRegistry
+from .static import LABEL_PREFIX, NUMERIC_LABEL, REFERENCE_LABELS, REFERENCE_PATTERN
 
 import json
 import os
 import logging
+import torch
 
 logger = logging.getLogger(__name__)
 
+SIMILARITY_THRESHOLD = 0.8
+# Rows of the similarity matrix scored at once, peak memory is SIMILARITY_TILE_ROWS x n floats
+SIMILARITY_TILE_ROWS = 256
+
 def create_folder(folder):
     if not os.path.exists(folder):
         os.makedirs(folder)
@@ -80,68 +89,121 @@ def create_nodes(text):
     return paragraphs
 
 
-def generate_graph_data(paragraphs: list) -> dict:
-    # BELLICUMPHARMACEUTICALS,INC_05_07_2019-EX-10.1-Supply Agreement
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+def label_index(texts: list) -> dict:
+    """
+    Map every reference label a text starts with to the text positions.
+
+    A text starting with "4.2.1 Term" is listed under "4", "4.2" and "4.2.1",
+    one starting with "B. Fees" under "B", so a lookup gives exactly the texts
+    that startswith the label.
+    """
+    index = {}
+    for position, text in enumerate(texts):
+        match = LABEL_PREFIX.match(text)
+        if not match:
+            continue
+
+        run = match.group()
+        labels = [run] if run.isalpha() else [
+            run[:end] for end in range(1, len(run) + 1)
+            if NUMERIC_LABEL.fullmatch(run[:end])
+        ]
+        for label in labels:
+            index.setdefault(label, []).append(position)
+    return index
+
+
+def reference_edges(ids: list, texts: list) -> list:
+    """
+    reference edges from every section/article/exhibit/... citation to the
+    nodes starting with the cited label. A target cited several times with the
+    same label gets a single edge.
+    """
+    index = label_index(texts)
+    edges = []
 
-    ## EXPLAIN WHY ?
-    nodes = []
+    for node_id, text in zip(ids, texts):
+        # Patterns used to run one after another, keep their order in the output
+        matches = sorted(
+            ((match.lastgroup, match.group(match.lastgroup)) for match in REFERENCE_PATTERN.finditer(text)),
+            key=lambda match: REFERENCE_LABELS[match[0]],
+        )
+
+        seen = set()
+        for ref_type, ref_id in matches:
+            for position in index.get(ref_id, ()):
+                target_id = ids[position]
+                if target_id == node_id or (target_id, ref_type) in seen:
+                    continue
+                seen.add((target_id, ref_type))
+                edges.append({
+                    "source": node_id,
+                    "target": target_id,
+                    "type": "reference",
+                    "score": None,
+                    "ref_label": ref_type,
+                    "ref_value": ref_id
+                })
+
+    return edges
+
+
+def similarity_edges(embeddings, node_ids: list, threshold: float = SIMILARITY_THRESHOLD,
+                     tile_rows: int = SIMILARITY_TILE_ROWS) -> list:
+    """
+    semantic_similarity edges for every pair i < j whose cosine similarity is
+    above threshold, in row-major order. The n x n matrix is scored one tile of
+    rows at a time, so it is never held in memory as a whole.
+    """
+    embeddings = util.normalize_embeddings(torch.as_tensor(embeddings))
     edges = []
-    
-    for p in paragraphs:
-        nodes.append({
-            "id": p.id,
-            "documentId": p.documentId,
-            "text": p.text.strip(),
-            "paragraph_enum": p.paragraph_enum,
-            "page": p.page,
-            "bbox": p.bbox,
-            "relationsCount": p.relationsCount
-        })
-    
-    logger.info(f"TOTAL PARAGRAPH {len(paragraphs)}\n\n")
-    logger.info(f"TOTAL NODES {len(nodes)}\n\n")
-
-    for i in range(len(nodes)):
-        current_text = nodes[i]["text"]
-        
-        for ref_type, pattern in REFERENCE_PATTERNS:
-            matches = pattern.finditer(current_text)
-            
-            for match in matches:
-                ref_id = match.group(1)
-                
-                for target_node in nodes:
-                    if target_node["id"] != nodes[i]["id"] and target_node["text"].startswith(ref_id):
-                        edges.append({
-                            "source": nodes[i]["id"], 
-                            "target": target_node["id"], 
-                            "type": "reference",
-                            "ref_label": ref_type,
-                            "ref_value": ref_id
-                        })
-
-    if nodes:
-        embeddings = model.encode([n["text"] for n in nodes], convert_to_tensor=True)
-        cosine_scores = util.cos_sim(embeddings, embeddings)
-
-        for i in range(len(nodes)):
-            for j in range(i + 1, len(nodes)):
-                if cosine_scores[i][j] > 0.8: # Threshold for similarity
-                    edges.append({
-                        "source": nodes[i]["id"], 
-                        "target": nodes[j]["id"], 
-                        "type": "semantic_similarity", 
-                        "score": float(cosine_scores[i][j])
-                    })
-
-    relations_map = {}
-    for edge in edges:
-        s, t = edge['source'], edge['target']
-        relations_map[s] = relations_map.get(s, 0) + 1
-        relations_map[t] = relations_map.get(t, 0) + 1
-    
-    for node in nodes:
-        node["relationsCount"] = relations_map.get(node["id"], 0)
 
-    return {"nodes": nodes, "edges": edges}
+    # Scores can differ from the full matrix in the last float32 bit, BLAS picks
+    # its kernels by tile shape
+    for start in range(0, len(node_ids), tile_rows):
+        scores = torch.mm(embeddings[start:start + tile_rows], embeddings.T)
+        # Only the upper triangle, j > i
+        mask = torch.triu(scores > threshold, diagonal=start + 1)
+        rows, cols = torch.nonzero(mask, as_tuple=True)
+
+        for i, j, score in zip((rows + start).tolist(), cols.tolist(), scores[rows, cols].tolist()):
+            edges.append({
+                "source": node_ids[i],
+                "target": node_ids[j],
+                "type": "semantic_similarity",
+                "score": score,
+                "ref_label": None,
+                "ref_value": None
+            })
+
+    return edges
+
+
+def generate_graph_data(
+    document: DocumentModel,
+    model: SentenceTransformer | None = None,
+    embedding_cache: EmbeddingCache | None = None,
+) -> dict:
+    # BELLICUMPHARMACEUTICALS,INC_05_07_2019-EX-10.1-Supply Agreement
+    if model is None:
+        model = ModelRegistry().get_encoder()
+
+    logger.info(f"TOTAL NODES {len(document)}\n\n")
+
+    edges = reference_edges(document.ids, document.texts)
+
+    if len(document):
+        if embedding_cache is not None:
+            embeddings = embedding_cache.encode(document.texts, model, batch_size=Config.EMBEDDING_BATCH_SIZE)
+        else:
+            embeddings = model.encode(
+                document.texts,
+                batch_size=Config.EMBEDDING_BATCH_SIZE,
+                convert_to_tensor=True,
+                show_progress_bar=False,
+            )
+        edges.extend(similarity_edges(embeddings, document.ids))
+
+    document.count_relations(edges)
+
+    return {"nodes": document.to_nodes(), "edges": edges}
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+from utils.graph_codec import GZIP_LEVEL, dumps, loads
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class ResultStore:
+    """
+    Final /process results, nodes, edges and ranked contradictions, one
+    gzipped JSON file per document and pipeline fingerprint. A second
+    instance keyed by graph_fingerprint keeps the graphs alone.
+
+    The fingerprint covers the pipeline version and the models and settings
+    that shape a result, it is part of the file names so results of another
+    configuration are simply missing. A small sidecar records the PDF hash the
+    result was built from and the ETag of the compressed body, which is
+    written without a timestamp so equal results get equal ETags and can be
+    served as is to clients that accept gzip.
+    """
+
+    def __init__(self, store_dir: Path, fingerprint: str):
+        self.store_dir = Path(store_dir)
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self._lock = threading.Lock()
+
+    def _base(self, document_id: str) -> Path:
+        # Upload ids come from clients, keep them out of the path
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", document_id).strip("_.")[:80]
+        digest = hashlib.sha256(document_id.encode("utf-8")).hexdigest()[:8]
+        return self.store_dir / f"{slug}-{digest}.{self.fingerprint[:16]}"
+
+    def save(self, document_id: str, pdf_sha256: str, graph: dict) -> dict:
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        body = gzip.compress(dumps(graph), compresslevel=GZIP_LEVEL, mtime=0)
+        meta = {
+            "document_id": document_id,
+            "pdf_sha256": pdf_sha256,
+            "fingerprint": self.fingerprint,
+            "etag": etag_for(body),
+            "bytes": len(body),
+        }
+
+        # The sidecar goes last, it never describes a body that is not there yet
+        base = self._base(document_id)
+        for suffix, data in ((".json.gz", body), (".meta.json", json.dumps(meta).encode("utf-8"))):
+            fd, tmp = tempfile.mkstemp(dir=self.store_dir, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, base.with_name(base.name + suffix))
+
+        with self._lock:
+            self.saves += 1
+        return meta
+
+    def has(self, document_id: str) -> bool:
+        base = self._base(document_id)
+        return base.with_name(base.name + ".meta.json").exists()
+
+    def get_meta(self, document_id: str, pdf_sha256: str | None = None) -> dict | None:
+        """
+        The sidecar of the stored result, None when there is none or, given
+        pdf_sha256, when it was built from another PDF.
+        """
+        base = self._base(document_id)
+        try:
+            meta = json.loads(base.with_name(base.name + ".meta.json").read_bytes())
+        except FileNotFoundError:
+            meta = None
+        if meta is not None and pdf_sha256 and meta["pdf_sha256"] != pdf_sha256:
+            meta = None
+
+        with self._lock:
+            if meta is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return meta
+
+    def load_bytes(self, document_id: str) -> bytes | None:
+        """
+        The gzipped JSON body of the stored result.
+        """
+        base = self._base(document_id)
+        try:
+            return base.with_name(base.name + ".json.gz").read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def load(self, document_id: str) -> dict | None:
+        body = self.load_bytes(document_id)
+        return loads(gzip.decompress(body)) if body is not None else None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saves": self.saves,
+            "fingerprint": self.fingerprint,
+        }
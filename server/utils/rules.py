@@ -0,0 +1,234 @@
+import re
+from datetime import date
+from itertools import product
+
+# Deterministic detection of numeric and deontic conflicts between linked
+# paragraphs. Results use the same shape as the LLM verdicts, so they go
+# through postfilter_and_rank and become Contradiction objects the same way.
+
+RULE_CONFIDENCE = 0.8
+
+# Content words around a quantity or modal that have to match on both sides
+CONTEXT_WORDS = 4
+MIN_SHARED_CONTEXT = 3
+MIN_CONTEXT_OVERLAP = 0.6
+# Content words after a modal's verb, its object
+OBJECT_WORDS = 3
+
+STOPWORDS = {
+    "a", "an", "and", "any", "as", "at", "be", "by", "for", "from", "in", "into", "is",
+    "its", "of", "on", "or", "such", "than", "that", "the", "this", "to", "upon", "with",
+    "within", "no", "not", "later", "more", "less", "least", "up", "after", "before", "prior",
+    "shall", "must", "will", "may", "are", "was", "were", "been", "has", "have", "all", "each",
+}
+
+PRONOUNS = {"it", "he", "she", "they", "we", "you", "which", "who", "that", "each", "either"}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+    "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14, "fifteen": 15,
+    "twenty": 20, "thirty": 30, "forty": 40, "forty-five": 45, "fifty": 50, "sixty": 60,
+    "seventy-five": 75, "ninety": 90, "hundred": 100,
+}
+
+UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+MONTHS = {
+    name: index for index, name in enumerate(
+        ["january", "february", "march", "april", "may", "june", "july", "august",
+         "september", "october", "november", "december"], start=1)
+}
+
+_NUMBER = r"(?:\d[\d,]*(?:\.\d+)?)"
+_WORD_NUMBER = "|".join(sorted(NUMBER_WORDS, key=len, reverse=True))
+
+# thirty (30) days / 30 calendar days / ninety days / 2 years / 60-day
+DURATION_PATTERN = re.compile(
+    rf"\b(?:(?P<word>{_WORD_NUMBER})\s*)?(?:\(?(?P<number>{_NUMBER})\)?[\s-]*)?"
+    r"(?P<kind>business |calendar |working )?(?P<unit>day|week|month|year)s?\b",
+    re.IGNORECASE,
+)
+# $1,000,000 / US$ 2.5 million / $500
+AMOUNT_PATTERN = re.compile(
+    rf"(?:US)?\$\s?(?P<number>{_NUMBER})(?:\s*(?P<scale>thousand|million|billion))?",
+    re.IGNORECASE,
+)
+# 15% / 2.5 percent
+PERCENT_PATTERN = re.compile(rf"(?P<number>{_NUMBER})\s*(?:%|percent\b|per cent\b)", re.IGNORECASE)
+# January 1, 2020
+DATE_PATTERN = re.compile(
+    rf"\b(?P<month>{'|'.join(MONTHS)})\s+(?P<day>\d{{1,2}}),?\s+(?P<year>\d{{4}})\b",
+    re.IGNORECASE,
+)
+# Licensee shall not assign / Company may terminate / Distributor must pay
+MODAL_PATTERN = re.compile(
+    r"\b(?P<subject>[A-Za-z][\w-]*)\s+(?P<modal>shall|must|will|may)\s+(?P<negation>not\s+)?(?:be\s+)?"
+    r"(?:(?:entitled|permitted|allowed|required)\s+to\s+)?(?P<action>[a-z]+)\b",
+)
+
+# (b) / iii) / 4. / 3.5.2 at the start of a paragraph, a list item or numbered clause
+LIST_ITEM = re.compile(r"^(?:\(?([a-z]{1,2}|[ivx]{1,5}|\d{1,2})[).]|(\d+(?:\.\d+)+)\.?)\s", re.IGNORECASE)
+
+SCALES = {"thousand": 1e3, "million": 1e6, "billion": 1e9}
+KIND_NAMES = {"days": "days", "business_days": "business days", "usd": "USD amounts", "percent": "percentages", "date": "dates"}
+WORD = re.compile(r"[a-z]+")
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def _clause(text: str, start: int, end: int) -> tuple[int, int]:
+    """
+    Bounds of the clause around a match, cut at the nearest sentence or
+    clause delimiter and at most 120 characters on each side.
+    """
+    left = max(text.rfind(d, 0, start) for d in (";", ". ", ":")) + 1
+    right = [i for i in (text.find(d, end) for d in (";", ". ", ":")) if i != -1]
+    right = min(right) if right else len(text)
+    return max(left, start - 120), min(right, end + 120)
+
+
+def _words(text: str) -> list[str]:
+    # Crude plural folding, "invoices" and "invoice" are the same term
+    return [w[:-1] if len(w) > 3 and w.endswith("s") else w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def _fact(text: str, start: int, end: int) -> tuple[frozenset, str]:
+    """
+    Content words next to a match within its clause, and the clause itself as
+    evidence, always an exact substring of text.
+    """
+    left, right = _clause(text, start, end)
+    context = _words(text[left:start])[-CONTEXT_WORDS:] + _words(text[end:right])[:CONTEXT_WORDS]
+    return frozenset(context), text[left:right].strip()
+
+
+def extract_facts(text: str) -> dict:
+    """
+    Quantities and modal statements of a paragraph.
+
+    "quantities" holds (kind, value, context, span) tuples with values in a
+    common unit per kind: days for durations, USD for amounts, percent, and
+    ordinal days for dates. "modals" holds (subject, action, object,
+    polarity, span). "item" is the list marker the paragraph starts with.
+    """
+    quantities = []
+
+    for match in DURATION_PATTERN.finditer(text):
+        if match["number"]:
+            value = _number(match["number"])
+        elif match["word"]:
+            value = NUMBER_WORDS[match["word"].lower()]
+        else:
+            continue
+        kind = "business_days" if (match["kind"] or "").strip().lower() in ("business", "working") else "days"
+        days = value * (1 if kind == "business_days" else UNIT_DAYS[match["unit"].lower()])
+        quantities.append((kind, days, *_fact(text, match.start(), match.end())))
+
+    for match in AMOUNT_PATTERN.finditer(text):
+        value = _number(match["number"]) * SCALES.get((match["scale"] or "").lower(), 1)
+        quantities.append(("usd", value, *_fact(text, match.start(), match.end())))
+
+    for match in PERCENT_PATTERN.finditer(text):
+        quantities.append(("percent", _number(match["number"]), *_fact(text, match.start(), match.end())))
+
+    for match in DATE_PATTERN.finditer(text):
+        try:
+            value = date(int(match["year"]), MONTHS[match["month"].lower()], int(match["day"])).toordinal()
+        except ValueError:
+            continue
+        quantities.append(("date", value, *_fact(text, match.start(), match.end())))
+
+    modals = []
+    for match in MODAL_PATTERN.finditer(text):
+        subject = match["subject"].lower()
+        if subject in PRONOUNS or subject in STOPWORDS:
+            continue
+        if match["negation"]:
+            polarity = "prohibition"
+        elif match["modal"] == "may":
+            polarity = "permission"
+        else:
+            polarity = "obligation"
+        left, right = _clause(text, match.start(), match.end())
+        obj = frozenset(_words(text[match.end():right])[:OBJECT_WORDS])
+        modals.append((subject, match["action"], obj, polarity, text[left:right].strip()))
+
+    item = LIST_ITEM.match(text)
+    return {"quantities": quantities, "modals": modals, "item": (item.group(1) or item.group(2)).lower() if item else None}
+
+
+def _format(kind: str, value: float) -> str:
+    if kind == "date":
+        return date.fromordinal(int(value)).isoformat()
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+def _similar_context(a: frozenset, b: frozenset, min_shared: int = MIN_SHARED_CONTEXT) -> bool:
+    shared = len(a & b)
+    return shared >= min_shared and shared / len(a | b) >= MIN_CONTEXT_OVERLAP
+
+
+def compare_facts(facts_a: dict, facts_b: dict) -> dict | None:
+    """
+    A contradiction verdict for two paragraphs, or None when the rules find
+    no conflict. Deontic conflicts win over numeric ones, as in TYPE_PRIORITY.
+    """
+    # Sibling list items, e.g. (b) and (c) of a fee schedule, differ by design
+    if facts_a["item"] and facts_b["item"] and facts_a["item"] != facts_b["item"]:
+        return None
+
+    for (subject_a, action_a, object_a, polarity_a, span_a), (subject_b, action_b, object_b, polarity_b, span_b) in product(
+        facts_a["modals"], facts_b["modals"]
+    ):
+        if subject_a != subject_b or action_a != action_b:
+            continue
+        # "shall not provide reports" vs "shall provide support" is no conflict
+        if object_a != object_b and not _similar_context(object_a, object_b, min_shared=2):
+            continue
+        if (polarity_a == "prohibition") != (polarity_b == "prohibition"):
+            return {
+                "label": "contradiction",
+                "type": "deontic",
+                "confidence": RULE_CONFIDENCE,
+                "evidence": {"source": span_a, "target": span_b},
+                "summary": f"{subject_a} {action_a}: {polarity_a} in one paragraph, {polarity_b} in the other",
+                "detector": "rules",
+            }
+
+    for (kind_a, value_a, context_a, span_a), (kind_b, value_b, context_b, span_b) in product(
+        facts_a["quantities"], facts_b["quantities"]
+    ):
+        if kind_a != kind_b or value_a == value_b or not _similar_context(context_a, context_b):
+            continue
+        # The other paragraph may state the same term elsewhere, e.g. a cap and a sub-cap
+        if any(k == kind_a and v == value_a and _similar_context(c, context_b) for k, v, c, _ in facts_b["quantities"]):
+            continue
+        return {
+            "label": "contradiction",
+            "type": "numeric",
+            "confidence": RULE_CONFIDENCE,
+            "evidence": {"source": span_a, "target": span_b},
+            "summary": f"Different {KIND_NAMES[kind_a]} for the same term: {_format(kind_a, value_a)} vs {_format(kind_b, value_b)}",
+            "detector": "rules",
+        }
+
+    return None
+
+
+def detect_conflicts(candidates: list[tuple[dict, str, str]]) -> list[dict | None]:
+    """
+    Rule verdicts for (edge, text_a, text_b) candidates, aligned with them.
+    Facts are extracted once per distinct paragraph, so the cost is one regex
+    pass per paragraph plus a few set comparisons per edge.
+    """
+    facts = {}
+    results = []
+    for _, a, b in candidates:
+        if a not in facts:
+            facts[a] = extract_facts(a)
+        if b not in facts:
+            facts[b] = extract_facts(b)
+        results.append(compare_facts(facts[a], facts[b]))
+    return results
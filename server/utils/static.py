@@ -13,6 +13,17 @@ REFERENCE_PATTERNS = [
   ("appendix", re.compile(r'\b[Aa]ppendix\s+([A-Za-z]|\d+(?:\.\d+)*)\b')),
 ]
 
+# All of the above as one pattern, the named group that matched is the label
+REFERENCE_PATTERN = re.compile("|".join(
+  re.sub(r"\((?!\?)", f"(?P<{label}>", pattern.pattern, count=1)
+  for label, pattern in REFERENCE_PATTERNS
+))
+REFERENCE_LABELS = {label: order for order, (label, _) in enumerate(REFERENCE_PATTERNS)}
+
+# Leading characters of a paragraph that a reference can point at: "4.2.1" or "B"
+LABEL_PREFIX = re.compile(r'[\d.]+|[A-Za-z]')
+NUMERIC_LABEL = re.compile(r'\d+(?:\.\d+)*')
+
 
 # Hierarchical pattern: captures sections with sublevels
 # ref_match = re.search(r'[Ss]ection\s+(\d+(\.\d+)*)', nodes[i]["text"])        
@@ -0,0 +1,130 @@
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from utils.upload_store import UploadWriter
+
+# Room for the boundaries, part headers and text fields next to the file
+FORM_OVERHEAD_BYTES = 64 * 1024
+FIELD_MAX_BYTES = 16 * 1024
+FILE_FIELD = "file"
+
+
+class FormError(ValueError):
+    pass
+
+
+class UploadForm:
+    """
+    A multipart/form-data body read as it arrives, instead of being spooled
+    whole first. Text fields are kept, at most FIELD_MAX_BYTES each, and the
+    bytes of the one PDF in the file field go to an UploadWriter chunk by
+    chunk, so an upload past the store's limit stops the read right there.
+    """
+
+    def __init__(self, open_upload):
+        self.open_upload = open_upload
+        self.fields: dict[str, str] = {}
+        self.upload: UploadWriter | None = None
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._name = ""
+        self._data: bytearray | None = None
+        # File bytes parsed out of the last chunk, written off the event loop
+        self._pending: list[bytes] = []
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._data = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise FormError("Form part without a name")
+        self._name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" not in options:
+            self._data = bytearray()
+            return
+
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        if self._name != FILE_FIELD or self.upload is not None:
+            raise FormError(f"Only one file is accepted, in the {FILE_FIELD} field")
+        if not filename.lower().endswith(".pdf"):
+            raise FormError("Only PDF files are allowed")
+        self.upload = self.open_upload(filename)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._data is None:
+            self._pending.append(data[start:end])
+            return
+        if len(self._data) + end - start > FIELD_MAX_BYTES:
+            raise FormError(f"Form field {self._name} exceeds {FIELD_MAX_BYTES} bytes")
+        self._data += data[start:end]
+
+    def on_part_end(self):
+        if self._data is not None:
+            self.fields[self._name] = self._data.decode("utf-8", errors="replace")
+
+    async def read(self, request: Request) -> tuple[dict[str, str], UploadWriter | None]:
+        """
+        Text fields of the form and the writer holding its upload, None when
+        no file was sent. Any failure drops what was written of the upload.
+        """
+        _, params = parse_options_header(request.headers.get("content-type", ""))
+        if b"boundary" not in params:
+            raise FormError("Missing boundary in multipart form")
+
+        parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if self._pending:
+                    data = b"".join(self._pending)
+                    self._pending.clear()
+                    await run_in_threadpool(self.upload.write, data)
+            parser.finalize()
+        except MultipartParseError as e:
+            self._abort()
+            raise FormError(f"Malformed multipart form: {e}")
+        except BaseException:
+            self._abort()
+            raise
+        return self.fields, self.upload
+
+    def _abort(self):
+        if self.upload is not None:
+            self.upload.abort()
+
+
+async def read_upload_form(request: Request, open_upload) -> tuple[dict[str, str], UploadWriter | None]:
+    """
+    Text fields and upload of a form post, see UploadForm. Bodies that are
+    not multipart carry no file and are read by Starlette.
+    """
+    content_type, _ = parse_options_header(request.headers.get("content-type", ""))
+    if content_type == b"multipart/form-data":
+        return await UploadForm(open_upload).read(request)
+    form = await request.form()
+    return {key: value for key, value in form.items() if isinstance(value, str)}, None
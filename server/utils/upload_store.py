@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+class UploadWriter:
+    """
+    One upload being received: chunks are hashed and written to a temp file
+    as they come, and the whole upload is dropped on the first one past the
+    store's max_bytes. commit() files it under its hash, abort() drops it.
+    """
+
+    def __init__(self, store: "UploadStore", filename: str):
+        self.store = store
+        self.filename = filename
+        self.size = 0
+        self._digest = hashlib.sha256()
+        store.store_dir.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=store.store_dir, prefix=".tmp-")
+        self._out = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.store.max_bytes:
+            self.abort()
+            self.store.reject()
+        self._digest.update(chunk)
+        self._out.write(chunk)
+
+    def commit(self) -> tuple[str, Path]:
+        """
+        SHA-256 and stored path of the upload.
+        """
+        self._out.close()
+        try:
+            return self.store.add(self._tmp, self._digest.hexdigest(), self.filename, self.size)
+        finally:
+            self.abort()
+
+    def abort(self):
+        self._out.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+class UploadStore:
+    """
+    Uploaded PDFs stored by the SHA-256 of their content.
+
+    Bodies are written to disk by an UploadWriter while they are hashed, and
+    dropped as soon as they pass max_bytes. A file whose hash is already
+    stored is discarded, the upload resolves to the existing copy and with it
+    to its cached parse and results. A sidecar keeps the original file name.
+    """
+
+    def __init__(self, store_dir: Path, max_bytes: int):
+        self.store_dir = Path(store_dir)
+        self.max_bytes = max_bytes
+        self.stored = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _path(self, sha256: str) -> Path:
+        return self.store_dir / f"{sha256}.pdf"
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+        raise UploadTooLarge(self.max_bytes)
+
+    def check_length(self, length: int):
+        """
+        Refuses an upload announced as length bytes before any of it is read.
+        """
+        if length > self.max_bytes:
+            self.reject()
+
+    def open(self, filename: str) -> UploadWriter:
+        return UploadWriter(self, filename)
+
+    def add(self, tmp: str, sha256: str, filename: str, size: int) -> tuple[str, Path]:
+        """
+        Moves the complete upload at tmp into the store, unless one with the
+        same hash is there already.
+        """
+        path = self._path(sha256)
+        if path.exists():
+            with self._lock:
+                self.duplicates += 1
+            return sha256, path
+
+        path.with_suffix(".json").write_text(json.dumps({"name": filename, "bytes": size}))
+        os.replace(tmp, path)
+        with self._lock:
+            self.stored += 1
+        logger.info(f"Stored upload {filename} as {sha256} ({size} bytes)")
+        return sha256, path
+
+    def entries(self):
+        """
+        (sha256, original name, path) of every stored upload.
+        """
+        if not self.store_dir.exists():
+            return
+        for path in self.store_dir.glob("*.pdf"):
+            try:
+                name = json.loads(path.with_suffix(".json").read_text())["name"]
+            except (FileNotFoundError, ValueError, KeyError):
+                name = path.name
+            yield path.stem, name, path
+
+    def stats(self) -> dict:
+        return {
+            "stored": self.stored,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "max_bytes": self.max_bytes,
+        }
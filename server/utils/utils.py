@@ -1,7 +1,10 @@
 from pathlib import Path
 from typing import Optional, Tuple, List
 from fuzzywuzzy import fuzz
+import hashlib
 import re
+import numpy as np
+from utils.line_index import LineIndex
 
 def iter_pdfs(base_dir: Path):
     return (
@@ -9,64 +12,68 @@ def iter_pdfs(base_dir: Path):
         if p.is_file() and p.suffix.lower() == ".pdf"
     )
 
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def _norm(s: str) -> str:
     s = s.lower()
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
-def _intersects(a: List[float], b: List[float], pad: float = 0.0) -> bool:
-    ax0, ay0, ax1, ay1 = a
-    bx0, by0, bx1, by1 = b
-    ax0 -= pad; ay0 -= pad; ax1 += pad; ay1 += pad
-    return not (ax1 < bx0 or bx1 < ax0 or ay1 < by0 or by1 < ay0)
-
 def find_evidence_bbox(
-    df_lines,
+    lines,
     page: int,
     para_bbox: List[float],
     evidence: str,
     pad: float = 1.5,
 ) -> Tuple[Optional[List[float]], Optional[int]]:
+    """
+    Box of the evidence among the lines of page inside para_bbox, from one
+    line, a run of up to four lines, or the best fuzzy line. lines is the
+    document's LineIndex, a line frame is indexed on the spot.
+    """
     ev = _norm(evidence or "")
     if not ev:
         return None, None
 
-    page_lines = df_lines[df_lines["page"] == page].copy()
-    if page_lines.empty:
+    if not isinstance(lines, LineIndex):
+        lines = LineIndex(lines)
+    page_lines = lines.pages.get(page)
+    if page_lines is None:
         return None, None
 
-    cand = []
-    for _, r in page_lines.iterrows():
-        lb = [float(r["x0"]), float(r["y0"]), float(r["x1"]), float(r["y1"])]
-        if _intersects(lb, para_bbox, pad=pad):
-            cand.append((r["text"], lb))
-
-    if not cand:
+    x0, y0, x1, y1 = para_bbox
+    boxes = page_lines.boxes
+    inside = ~(
+        (boxes[:, 2] + pad < x0) | (x1 < boxes[:, 0] - pad) |
+        (boxes[:, 3] + pad < y0) | (y1 < boxes[:, 1] - pad)
+    )
+    rows = np.flatnonzero(inside)
+    if len(rows) == 0:
         return None, None
 
-    for txt, lb in cand:
-        if ev in _norm(txt):
-            return lb, page
-
-    norm_lines = [(_norm(t), b) for t, b in cand]
-
-    max_window = 4 
-    for w in range(2, max_window + 1):
-        for i in range(0, len(norm_lines) - w + 1):
-            chunk_txt = " ".join(norm_lines[i + k][0] for k in range(w))
-            if ev in chunk_txt:
-                boxes = [norm_lines[i + k][1] for k in range(w)]
-                x0 = min(b[0] for b in boxes); y0 = min(b[1] for b in boxes)
-                x1 = max(b[2] for b in boxes); y1 = max(b[3] for b in boxes)
-                return [x0, y0, x1, y1], page
+    # Candidate lines joined by single spaces, a hit maps back to the lines it spans
+    norm = [page_lines.norm[i] for i in rows]
+    text = " ".join(norm)
+    ends = np.cumsum([len(t) + 1 for t in norm]) - 1
+    starts = ends - np.array([len(t) for t in norm])
+    position = text.find(ev)
+    if position != -1:
+        hit = rows[(starts < position + len(ev)) & (ends > position)]
+        if len(hit) <= 4:
+            return page_lines.union(hit), page
 
     best = (0, None)
-    for txt, lb in cand:
-        score = fuzz.partial_ratio(ev, _norm(txt))
+    for i, txt in zip(rows, norm):
+        score = fuzz.partial_ratio(ev, txt)
         if score > best[0]:
-            best = (score, lb)
+            best = (score, i)
 
     if best[0] >= 90:
-        return best[1], page
+        return page_lines.union([best[1]]), page
 
     return None, None
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Entries added between two eviction passes
+EVICT_EVERY = 500
+# Part of every key, bumped when keys change so old entries are never read
+KEY_VERSION = 2
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def swap_sides(result: dict) -> dict:
+    # The verdict was given with A and B the other way round
+    evidence = result.get("evidence") or {}
+    return {**result, "evidence": {"source": evidence.get("target", ""), "target": evidence.get("source", "")}}
+
+
+class VerdictCache:
+    """
+    SQLite cache of contradiction verdicts.
+
+    Keyed by model, a hash of the prompt templates and the hashes of the
+    whitespace-normalized paragraphs, sorted, so A-B and B-A share an entry.
+    Verdicts are kept with their sides in that order and swapped back for a
+    pair asked the other way round, since evidence is reported per side.
+    Responses that could not be parsed are cached too, as failures, so a
+    pair the model keeps answering badly is not paid for again. Entries
+    expire after ttl_seconds; past max_entries the least recently used ones
+    are dropped.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: float, max_entries: int):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.failure_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(model: str, prompt_hash: str, a: str, b: str) -> tuple[str, bool]:
+        """
+        Key of the pair, the same both ways round, and whether a and b come
+        in the reverse of the order the verdict is kept in.
+        """
+        ha, hb = text_hash(a), text_hash(b)
+        raw = json.dumps([KEY_VERSION, model, prompt_hash, min(ha, hb), max(ha, hb)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest(), hb < ha
+
+    def get(self, model: str, prompt_hash: str, a: str, b: str):
+        """
+        (True, result) on a hit, result being None for a cached failure and
+        its sides those of a and b, (False, None) on a miss.
+        """
+        key, swapped = self.key(model, prompt_hash, a, b)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT result, error FROM verdicts WHERE key = ? AND created > ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+
+            conn.execute("UPDATE verdicts SET accessed = ? WHERE key = ?", (now, key))
+            result, error = row
+            if error is not None:
+                self.failure_hits += 1
+                return True, None
+            self.hits += 1
+        result = json.loads(result)
+        return True, swap_sides(result) if swapped else result
+
+    def put(self, model: str, prompt_hash: str, a: str, b: str, result: dict | None = None, error: str | None = None):
+        self.put_many([(model, prompt_hash, a, b, result, error)])
+
+    def put_many(self, entries: list[tuple[str, str, str, str, dict | None, str | None]]):
+        """
+        put for every (model, prompt_hash, a, b, result, error), in one
+        transaction.
+        """
+        now = time.time()
+        rows = []
+        for model, prompt_hash, a, b, result, error in entries:
+            key, swapped = self.key(model, prompt_hash, a, b)
+            if result is not None:
+                result = json.dumps(swap_sides(result) if swapped else result)
+            rows.append((key, model, prompt_hash, result, error, now, now))
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            passes = self._puts // EVICT_EVERY
+            self._puts += len(rows)
+            if self._puts // EVICT_EVERY > passes:
+                self._evict()
+
+    def _evict(self):
+        conn = self._connection()
+        expired = conn.execute("DELETE FROM verdicts WHERE created <= ?", (time.time() - self.ttl_seconds,)).rowcount
+        overflow = conn.execute(
+            "DELETE FROM verdicts WHERE key IN ("
+            "SELECT key FROM verdicts ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        self.evictions += expired + overflow
+        if expired or overflow:
+            logger.info(f"Evicted {expired} expired and {overflow} least recently used verdicts")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, failures = self._connection().execute(
+                "SELECT COUNT(*), COUNT(error) FROM verdicts"
+            ).fetchone()
+        lookups = self.hits + self.failure_hits + self.misses
+        return {
+            "hits": self.hits,
+            "failure_hits": self.failure_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.failure_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "cached_failures": failures,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }